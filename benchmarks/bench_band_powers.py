@@ -0,0 +1,60 @@
+"""
+Compare the original per-bin Python loop for band powers against the
+vectorized, mask-cached API in server/utlis.py.
+
+    python benchmarks/bench_band_powers.py [--repeat 50] [--channels 8]
+"""
+import argparse
+import os
+import sys
+import timeit
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+from utlis import EEG_BANDS, batch_band_powers, calculate_fft  # noqa: E402
+
+SAMPLE_RATE = 256
+WINDOW_SIZES = (1280, 2560, 10240)
+
+
+def loop_band_powers(freq_bins, magnitudes):
+    """The original pure-Python implementation of calculate_band_powers."""
+    band_powers = {}
+    for band, (low, high) in EEG_BANDS.items():
+        power = 0.0
+        for f, mag in zip(freq_bins, magnitudes):
+            if low <= f < high:
+                power += mag**2
+        band_powers[band] = power
+    return band_powers
+
+
+def loop_pipeline(windows):
+    return [loop_band_powers(*calculate_fft(w.tolist())) for w in windows]
+
+
+def best_ms(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--channels", type=int, default=1)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'window':>8} {'channels':>8} {'loop ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for n in WINDOW_SIZES:
+        windows = rng.normal(size=(args.channels, n))
+
+        expected = np.array([list(d.values()) for d in loop_pipeline(windows)])
+        assert np.allclose(batch_band_powers(windows, SAMPLE_RATE), expected)
+
+        loop = best_ms(lambda: loop_pipeline(windows), args.repeat)
+        vector = best_ms(lambda: batch_band_powers(windows, SAMPLE_RATE), args.repeat)
+        print(f"{n:>8} {args.channels:>8} {loop:>10.3f} {vector:>10.3f} {loop / vector:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Timings for the shared feature engine (server/features.py): the original
+per-channel loop (data_clean's Welch features) against the batched engine
+across window sizes. That both give the same features is checked by
+tests/test_features.py.
+
+    python benchmarks/bench_features.py [--channels 19] [--repeat 10]
+"""
+import argparse
+import os
+import sys
+import timeit
+import numpy as np
+from scipy.signal import welch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+from features import TRAINING_BANDS, training_engine  # noqa: E402
+
+WINDOW_SIZES = (640, 1280, 2560, 10240)
+
+
+def reference_training_features(signal, fs=128):
+    """The original data_clean.extract_features_from_signal."""
+    features = [np.mean(signal), np.std(signal), np.max(signal), np.min(signal)]
+    freqs, psd = welch(signal, fs=fs)
+    total_power = np.sum(psd)
+    for low, high in TRAINING_BANDS.values():
+        band_power = np.sum(psd[(freqs >= low) & (freqs <= high)])
+        features.append(band_power / total_power if total_power > 0 else 0)
+    return features
+
+
+def best_ms(fn, repeat):
+    return min(timeit.repeat(fn, number=1, repeat=repeat)) * 1000
+
+
+def timings(rng, channels, repeat):
+    print(f"{'window':>8} {'channels':>8} {'loop ms':>10} {'engine ms':>10} {'speedup':>8}")
+    engine = training_engine(128)
+    for n in WINDOW_SIZES:
+        signals = rng.normal(size=(channels, n))
+        loop = best_ms(lambda: [reference_training_features(s) for s in signals], repeat)
+        batch = best_ms(lambda: engine.features(signals), repeat)
+        print(f"{n:>8} {channels:>8} {loop:>10.3f} {batch:>10.3f} {loop / batch:>7.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--channels", type=int, default=19)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    timings(np.random.default_rng(0), args.channels, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Ingest load test for /ws/esp32: sustained samples/sec with one JSON
+message per sample versus batched binary frames.
+
+Start the server first (cd server && python main.py), then:
+
+    python benchmarks/load_ingest.py [--url ws://localhost:8000] [--samples 51200] [--batch 64]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.request
+import numpy as np
+import websockets
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server"))
+from protocol import encode_frame  # noqa: E402
+
+
+def device_samples(http_url, device_id):
+    with urllib.request.urlopen(f"{http_url}/devices") as response:
+        devices = json.load(response)["devices"]
+    return next((d["samples"] for d in devices if d["device_id"] == device_id), 0)
+
+
+async def wait_for(http_url, device_id, total, timeout=120):
+    """Wait until the server has ingested `total` samples for device_id."""
+    deadline = time.perf_counter() + timeout
+    while device_samples(http_url, device_id) < total:
+        if time.perf_counter() > deadline:
+            raise TimeoutError(f"server ingested fewer than {total} samples")
+        await asyncio.sleep(0.01)
+
+
+async def run_json(ws_url, http_url, signal):
+    device_id = f"load-json-{os.getpid()}"
+    start_total = device_samples(http_url, device_id)
+    start = time.perf_counter()
+    async with websockets.connect(f"{ws_url}/ws/esp32?device_id={device_id}") as ws:
+        for value in signal:
+            await ws.send(json.dumps({"eeg": float(value)}))
+        await wait_for(http_url, device_id, start_total + len(signal))
+    return len(signal) / (time.perf_counter() - start)
+
+
+async def run_binary(ws_url, http_url, signal, batch):
+    device_id = f"load-bin-{os.getpid()}"
+    start_total = device_samples(http_url, device_id)
+    frames = [
+        encode_frame(signal[i:i + batch], device_id=device_id, sequence=seq)
+        for seq, i in enumerate(range(0, len(signal), batch))
+    ]
+    start = time.perf_counter()
+    async with websockets.connect(f"{ws_url}/ws/esp32?device_id={device_id}") as ws:
+        for frame in frames:
+            await ws.send(frame)
+        await wait_for(http_url, device_id, start_total + len(signal))
+    return len(signal) / (time.perf_counter() - start)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--samples", type=int, default=51200)
+    parser.add_argument("--batch", type=int, default=64, help="samples per binary frame")
+    args = parser.parse_args()
+
+    http_url = args.url.replace("ws://", "http://").replace("wss://", "https://")
+    signal = np.random.default_rng(0).normal(size=args.samples).astype(np.float32)
+
+    json_rate = await run_json(args.url, http_url, signal)
+    binary_rate = await run_binary(args.url, http_url, signal, args.batch)
+    print(f"json   (1 sample/msg):       {json_rate:12,.0f} samples/s")
+    print(f"binary ({args.batch} samples/frame): {binary_rate:12,.0f} samples/s")
+    print(f"speedup: {binary_rate / json_rate:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
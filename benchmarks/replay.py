@@ -0,0 +1,287 @@
+"""
+Replay / load generator for the EEG server.
+
+Streams recorded or synthetic EEG into /ws/esp32 as binary frames for N
+devices at a multiple of real time, while M binary /ws/dashboard clients per
+device measure sample-to-dashboard latency and missed frames. Server CPU is
+sampled from /proc when the server's PID is known (--pid, or --spawn to start
+it). Writes a JSON report and exits non-zero when a --max-* limit is exceeded.
+
+    python benchmarks/replay.py --spawn --devices 4 --dashboards 2 --speed 10 --duration 20
+    python benchmarks/replay.py --source data/emotion_data.csv --column voltage --speed 1
+    python benchmarks/replay.py --source EEG_data/AD/Eyes_open/Paciente1 --report replay.json
+
+--source is "synthetic" (default), a CSV file (--column selects the series)
+or a directory of one-channel .txt files (one channel per file).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import websockets
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, os.path.join(ROOT, "server"))
+from protocol import encode_frame  # noqa: E402
+from frames import HEADER as FRAME_HEADER  # noqa: E402
+
+
+def load_source(source, column, channels, sample_rate, seconds):
+    """Return a float32 (channels x samples) signal to replay (looped as needed)."""
+    if source == "synthetic":
+        t = np.arange(int(seconds * sample_rate)) / sample_rate
+        rng = np.random.default_rng(0)
+        # alpha rhythm plus noise, a different phase per channel
+        phases = rng.uniform(0, 2 * np.pi, size=(channels, 1))
+        signal = 20 * np.sin(2 * np.pi * 10 * t + phases) + 5 * rng.normal(size=(channels, len(t)))
+    elif os.path.isdir(source):
+        files = sorted(f for f in os.listdir(source) if f.endswith(".txt"))
+        if not files:
+            raise ValueError(f"no .txt files in {source}")
+        signals = [np.loadtxt(os.path.join(source, f)).ravel() for f in files[:channels]]
+        length = min(len(s) for s in signals)
+        signal = np.stack([s[:length] for s in signals])
+    else:
+        series = pd.read_csv(source)[column].to_numpy(dtype=float)
+        signal = np.tile(series, (channels, 1))
+    return np.ascontiguousarray(signal, dtype=np.float32)
+
+
+class CpuSampler:
+    """CPU time of a process from /proc/<pid>/stat (Linux only)."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.tick = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def cpu_seconds(self):
+        if self.pid is None or platform.system() != "Linux":
+            return None
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            return None
+        # utime and stime are fields 14 and 15 of the full line
+        return (int(fields[11]) + int(fields[12])) / self.tick
+
+
+class DeviceStats:
+    """Send times of one device's frames, for latency lookups by sample index."""
+
+    def __init__(self, device_id, batch):
+        self.device_id = device_id
+        self.batch = batch
+        self.send_times = []
+        self.samples_sent = 0
+
+    def sent_at(self, sample_index):
+        block = sample_index // self.batch
+        return self.send_times[block] if block < len(self.send_times) else None
+
+
+async def run_device(ws_url, stats, signal, sample_rate, speed, duration, start_event):
+    """Send `signal` (looped) in frames of stats.batch samples, paced to speed x real time."""
+    batch = stats.batch
+    interval = batch / (sample_rate * speed)
+    length = signal.shape[1]
+    await start_event.wait()
+    loop = asyncio.get_running_loop()
+    async with websockets.connect(f"{ws_url}/ws/esp32?device_id={stats.device_id}", max_size=None) as ws:
+        begin = loop.time()
+        sequence = 0
+        while loop.time() - begin < duration:
+            offset = (sequence * batch) % length
+            block = np.take(signal, range(offset, offset + batch), axis=1, mode="wrap")
+            frame = encode_frame(block, device_id=stats.device_id, sequence=sequence, sample_rate=sample_rate)
+            stats.send_times.append(time.perf_counter())
+            await ws.send(frame)
+            stats.samples_sent += batch
+            sequence += 1
+            delay = begin + sequence * interval - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+
+async def run_dashboard(ws_url, stats, queue, stop_event, ready):
+    """Subscribe to a device in the binary format and record per-frame latency and gaps."""
+    result = {"frames": 0, "latencies": [], "gaps": 0, "missed_samples": 0}
+    url = f"{ws_url}/ws/dashboard?device_id={stats.device_id}&format=binary&queue={queue}"
+    async with websockets.connect(url, max_size=None) as ws:
+        ready.release()
+        expected = None
+        while not stop_event.is_set():
+            try:
+                message = await asyncio.wait_for(ws.recv(), 0.25)
+            except asyncio.TimeoutError:
+                continue
+            received = time.perf_counter()
+            if isinstance(message, str):
+                continue  # hello
+            _, _, kind, _, _, _, n, start = FRAME_HEADER.unpack_from(message)
+            if n == 0:
+                continue
+            if expected is not None and kind == 1 and start > expected:
+                result["gaps"] += 1
+                result["missed_samples"] += start - expected
+            expected = start + n
+            result["frames"] += 1
+            sent = stats.sent_at(start + n - 1)
+            if sent is not None:
+                result["latencies"].append(received - sent)
+    return result
+
+
+def server_devices(http_url):
+    try:
+        with urllib.request.urlopen(f"{http_url}/devices", timeout=5) as response:
+            return {d["device_id"]: d for d in json.load(response)["devices"]}
+    except OSError:
+        return {}
+
+
+def spawn_server(http_url):
+    process = subprocess.Popen([sys.executable, "main.py"], cwd=os.path.join(ROOT, "server"),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline:
+        try:
+            urllib.request.urlopen(f"{http_url}/", timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("server did not start within 30 s")
+
+
+def percentile_ms(values, q):
+    return round(float(np.percentile(values, q)) * 1000, 3) if len(values) else None
+
+
+async def run(args):
+    http_url = args.url.replace("ws://", "http://").replace("wss://", "https://")
+    signal = load_source(args.source, args.column, args.channels, args.sample_rate, args.duration)
+    # device IDs travel in a 16-byte frame field
+    run_id = f"{int(time.time()) % 100000:05d}"
+    devices = [DeviceStats(f"replay{run_id}-{i}", args.batch) for i in range(args.devices)]
+
+    process = spawn_server(http_url) if args.spawn else None
+    cpu = CpuSampler(process.pid if process else args.pid)
+    try:
+        start_event, stop_event = asyncio.Event(), asyncio.Event()
+        ready = asyncio.Semaphore(0)
+        dashboards = [
+            asyncio.create_task(run_dashboard(args.url, stats, args.queue, stop_event, ready))
+            for stats in devices for _ in range(args.dashboards)
+        ]
+        for _ in dashboards:
+            await ready.acquire()
+
+        cpu_start, wall_start = cpu.cpu_seconds(), time.perf_counter()
+        start_event.set()
+        senders = [
+            asyncio.create_task(run_device(args.url, stats, signal, args.sample_rate, args.speed, args.duration, start_event))
+            for stats in devices
+        ]
+        await asyncio.gather(*senders)
+        send_seconds = time.perf_counter() - wall_start
+        # let the last frames arrive
+        await asyncio.sleep(args.drain)
+        wall = time.perf_counter() - wall_start
+        cpu_end = cpu.cpu_seconds()
+        stop_event.set()
+        results = await asyncio.gather(*dashboards)
+        server = server_devices(http_url)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=10)
+
+    latencies = np.concatenate([np.asarray(r["latencies"]) for r in results]) if results else np.array([])
+    samples_sent = sum(d.samples_sent for d in devices)
+    hop_frames = sum(d.samples_sent for d in devices) / args.hop * args.dashboards
+    frames = sum(r["frames"] for r in results)
+    report = {
+        "config": {k: v for k, v in vars(args).items() if k not in ("report",)},
+        "samples_sent": samples_sent,
+        "send_rate": round(samples_sent / send_seconds, 1),
+        "target_rate": args.devices * args.sample_rate * args.speed,
+        "wall_seconds": round(wall, 3),
+        "dashboard_frames": frames,
+        "expected_frames": int(hop_frames),
+        "latency_ms": {
+            "p50": percentile_ms(latencies, 50),
+            "p95": percentile_ms(latencies, 95),
+            "p99": percentile_ms(latencies, 99),
+            "max": round(float(latencies.max()) * 1000, 3) if len(latencies) else None,
+        },
+        "dashboard_gaps": sum(r["gaps"] for r in results),
+        "missed_samples": sum(r["missed_samples"] for r in results),
+        "ingest_dropped_frames": sum(server.get(d.device_id, {}).get("dropped_frames", 0) for d in devices),
+        "server_cpu_percent": (round((cpu_end - cpu_start) / wall * 100, 1)
+                               if cpu_start is not None and cpu_end is not None else None),
+    }
+    report["drop_rate"] = round(1 - frames / hop_frames, 4) if hop_frames else None
+    return report
+
+
+def check_limits(report, args):
+    failures = []
+    p99 = report["latency_ms"]["p99"]
+    if args.max_p99_ms is not None and (p99 is None or p99 > args.max_p99_ms):
+        failures.append(f"p99 latency {p99} ms > {args.max_p99_ms} ms")
+    if args.max_drop_rate is not None and (report["drop_rate"] or 0) > args.max_drop_rate:
+        failures.append(f"drop rate {report['drop_rate']} > {args.max_drop_rate}")
+    if args.min_send_ratio is not None and report["send_rate"] < args.min_send_ratio * report["target_rate"]:
+        failures.append(f"send rate {report['send_rate']} below {args.min_send_ratio:.0%} of target")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    parser.add_argument("--url", default="ws://localhost:8000")
+    parser.add_argument("--source", default="synthetic")
+    parser.add_argument("--column", default="voltage", help="CSV column to replay")
+    parser.add_argument("--channels", type=int, default=1)
+    parser.add_argument("--sample-rate", type=int, default=256)
+    parser.add_argument("--speed", type=float, default=1.0, help="multiple of real time (1-100)")
+    parser.add_argument("--devices", type=int, default=1)
+    parser.add_argument("--dashboards", type=int, default=1, help="subscribers per device")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds of wall time to stream")
+    parser.add_argument("--batch", type=int, default=32, help="samples per ingest frame")
+    parser.add_argument("--queue", type=int, default=8, help="dashboard queue size")
+    parser.add_argument("--hop", type=int, default=32, help="server FFT_HOP, for the expected frame count")
+    parser.add_argument("--drain", type=float, default=1.0, help="seconds to wait for late frames")
+    parser.add_argument("--pid", type=int, help="server PID for CPU measurement")
+    parser.add_argument("--spawn", action="store_true", help="start server/main.py for the run")
+    parser.add_argument("--report", help="write the JSON report here instead of stdout")
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--max-drop-rate", type=float)
+    parser.add_argument("--min-send-ratio", type=float, help="fail below this fraction of the target send rate")
+    args = parser.parse_args()
+    if not 0 < args.speed <= 100:
+        parser.error("--speed must be in (0, 100]")
+
+    report = asyncio.run(run(args))
+    failures = check_limits(report, args)
+    report["failures"] = failures
+    text = json.dumps(report, indent=2)
+    if args.report:
+        with open(args.report, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Microbenchmarks for the DSP and feature hot paths, asv style.
+
+Each benchmark is a function timed across a parameter grid (window size,
+channel count, dataset size). Results are saved as JSON under
+benchmarks/results/ and two result files can be compared; the comparison
+exits non-zero when a benchmark got slower than the threshold.
+
+    python benchmarks/suite.py list
+    python benchmarks/suite.py run [--filter fft] [--save baseline]
+    python benchmarks/suite.py compare baseline [HEAD] [--threshold 1.3]
+
+Without --save, results are stored under the current git commit's short hash.
+`compare BASE` without HEAD runs the suite now and compares against BASE.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "server"))
+import data_clean  # noqa: E402
+from utlis import calculate_band_powers, calculate_fft  # noqa: E402
+
+BENCHMARKS = {}
+
+
+def benchmark(name, **params):
+    """Register `setup(**params) -> callable` as benchmark `name` over a parameter grid."""
+    def register(setup):
+        BENCHMARKS[name] = (setup, params)
+        return setup
+    return register
+
+
+def signals(channels, samples, seed=0):
+    return np.random.default_rng(seed).normal(scale=20, size=(channels, samples))
+
+
+@benchmark("utlis.calculate_fft", window=[256, 1280, 2560, 10240])
+def bench_calculate_fft(window):
+    data = signals(1, window)[0].tolist()
+    return lambda: calculate_fft(data)
+
+
+@benchmark("utlis.calculate_band_powers", window=[256, 1280, 2560, 10240])
+def bench_calculate_band_powers(window):
+    freqs, magnitudes = calculate_fft(signals(1, window)[0].tolist())
+    return lambda: calculate_band_powers(freqs, magnitudes)
+
+
+@benchmark("data_clean.extract_features_from_signal", window=[640, 2560, 10240, 61440])
+def bench_extract_features_from_signal(window):
+    signal = signals(1, window)[0]
+    return lambda: data_clean.extract_features_from_signal(signal)
+
+
+@benchmark("data_clean.extract_features_batch", channels=[1, 8, 19], window=[2560, 10240])
+def bench_extract_features_batch(channels, window):
+    data = signals(channels, window)
+    return lambda: data_clean.extract_features_batch(data)
+
+
+@benchmark("data_clean.extract_patient_features", channels=[8, 19], samples=[10240, 61440])
+def bench_extract_patient_features(channels, samples):
+    # a patient folder of one-column .txt files, like EEG_data/<class>/<eye>/<patient>
+    directory = tempfile.mkdtemp(prefix="bench-patient-")
+    for ch, signal in enumerate(signals(channels, samples)):
+        np.savetxt(os.path.join(directory, f"ch{ch:02d}.txt"), signal, fmt="%.4f")
+    run = lambda: data_clean.extract_patient_features(directory, cache_dir=None)  # noqa: E731
+    run.cleanup = lambda: shutil.rmtree(directory, ignore_errors=True)
+    return run
+
+
+def cases(pattern=None):
+    """Yield (case id, setup, params) for every benchmark and parameter combination."""
+    for name, (setup, grid) in BENCHMARKS.items():
+        keys = list(grid)
+        for values in itertools.product(*(grid[k] for k in keys)):
+            params = dict(zip(keys, values))
+            case = name + "".join(f"[{k}={v}]" for k, v in params.items())
+            if pattern is None or pattern in case:
+                yield case, setup, params
+
+
+def time_case(fn, repeat, min_time):
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    # at least min_time seconds per sample
+    number = max(number, int(number * min_time / max(elapsed, 1e-9)) or 1)
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {"min": min(times), "median": statistics.median(times), "number": number, "repeat": repeat}
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(pattern=None, repeat=5, min_time=0.1, verbose=True):
+    results = {}
+    for case, setup, params in cases(pattern):
+        fn = setup(**params)
+        try:
+            results[case] = time_case(fn, repeat, min_time)
+        finally:
+            getattr(fn, "cleanup", lambda: None)()
+        if verbose:
+            print(f"{case:<70} {format_time(results[case]['min']):>10}", flush=True)
+    return {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "machine": {
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+        },
+        "benchmarks": results,
+    }
+
+
+def format_time(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def result_path(name):
+    return name if name.endswith(".json") else os.path.join(RESULTS_DIR, f"{name}.json")
+
+
+def load_results(name):
+    with open(result_path(name)) as f:
+        return json.load(f)
+
+
+def save_results(results, name):
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = result_path(name)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=1)
+        f.write("\n")
+    return path
+
+
+def compare(base, head, threshold):
+    """Print a comparison table; return the cases that got slower than threshold."""
+    slower = []
+    print(f"{'benchmark':<70} {'base':>10} {'head':>10} {'ratio':>7}")
+    for case in sorted(set(base["benchmarks"]) | set(head["benchmarks"])):
+        before, after = base["benchmarks"].get(case), head["benchmarks"].get(case)
+        if before is None or after is None:
+            print(f"{case:<70} {'-' if before is None else format_time(before['min']):>10} "
+                  f"{'-' if after is None else format_time(after['min']):>10}")
+            continue
+        ratio = after["min"] / before["min"]
+        mark = "  slower" if ratio > threshold else ("  faster" if ratio < 1 / threshold else "")
+        if ratio > threshold:
+            slower.append(case)
+        print(f"{case:<70} {format_time(before['min']):>10} {format_time(after['min']):>10} {ratio:>6.2f}x{mark}")
+    if base.get("machine") != head.get("machine"):
+        print("\nnote: results come from different machines or library versions")
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0],
+                                     formatter_class=argparse.RawDescriptionHelpFormatter, epilog=__doc__)
+    sub = parser.add_subparsers(dest="command", required=True)
+    listing = sub.add_parser("list", help="list benchmark cases")
+    listing.add_argument("--filter")
+    run = sub.add_parser("run", help="run the suite and save the results")
+    cmp = sub.add_parser("compare", help="compare two saved results (or a saved result with a fresh run)")
+    cmp.add_argument("base")
+    cmp.add_argument("head", nargs="?")
+    cmp.add_argument("--threshold", type=float, default=1.3, help="ratio above which a case counts as slower")
+    for p in (run, cmp):
+        p.add_argument("--filter", help="only cases whose id contains this text")
+        p.add_argument("--repeat", type=int, default=5)
+        p.add_argument("--min-time", type=float, default=0.1, help="seconds per timing sample")
+    run.add_argument("--save", help="result name (default: current commit)")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        for case, _, _ in cases(args.filter):
+            print(case)
+    elif args.command == "run":
+        results = run_suite(args.filter, args.repeat, args.min_time)
+        print(f"saved {save_results(results, args.save or results['commit'] or 'latest')}")
+    else:
+        base = load_results(args.base)
+        head = load_results(args.head) if args.head else run_suite(args.filter, args.repeat, args.min_time, verbose=False)
+        if args.filter:
+            base["benchmarks"] = {k: v for k, v in base["benchmarks"].items() if args.filter in k}
+        slower = compare(base, head, args.threshold)
+        sys.exit(1 if slower else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,276 @@
+import argparse
+import hashlib
+import json
 import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+
 import numpy as np
 import pandas as pd
-from scipy.signal import welch
 
-bands = {
-    'delta': (0.5, 4),
-    'theta': (4, 8),
-    'alpha': (8, 12),
-    'beta': (12, 30),
-}
+from signal_store import CLASSES, EYE_STATES, channel_views, load_index, open_recording, read_text_signal
+
+# band and feature definitions are shared with the live server (server/features.py)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'server'))
+import features  # noqa: E402
+from features import TRAINING_BANDS, training_engine  # noqa: E402
+
+bands = TRAINING_BANDS
+FEATURE_NAMES = training_engine().feature_names
+
+
+def extract_features_batch(signals, fs=128):
+    # (channels x samples) -> (channels x len(FEATURE_NAMES)), one Welch call for all channels
+    return training_engine(fs).features(signals)
+
+
+def extract_features_bucketed(signals, fs=128):
+    # signals of different lengths are grouped by length so each bucket is one batch
+    return training_engine(fs).features_bucketed(signals)
+
 
 def extract_features_from_signal(signal, fs=128):
-    features = {
-        'mean': np.mean(signal),
-        'std': np.std(signal),
-        'max': np.max(signal),
-        'min': np.min(signal),
+    return dict(zip(FEATURE_NAMES, extract_features_batch(signal, fs)[0]))
+
+
+def feature_columns(channels):
+    return training_engine().columns(channels)
+
+
+# bump when the extraction in this file changes; edits to server/features.py are picked up by its hash
+FEATURE_VERSION = 1
+
+
+@lru_cache(maxsize=None)
+def feature_spec(fs=128):
+    # identifies what a cached feature row was computed with: sample rate, band table, engine settings and code
+    engine = training_engine(fs)
+    spec = {
+        'version': FEATURE_VERSION,
+        'fs': fs,
+        'bands': engine.bands,
+        'features': engine.feature_names,
+        'spectrum': engine.spectrum,
+        'relative': engine.relative,
+        'closed': engine.closed,
+        'code': file_digest(features.__file__),
     }
-    freqs, psd = welch(signal, fs=fs)
-    total_power = np.sum(psd)
-    for band, (low, high) in bands.items():
-        band_power = np.sum(psd[(freqs >= low) & (freqs <= high)])
-        features[f'bandpower_{band}'] = band_power / total_power if total_power > 0 else 0
-    return features
-
-def extract_patient_features(patient_dir):
-    features = {}
-    for file in os.listdir(patient_dir):
-        if file.endswith('.txt'):
-            channel = os.path.splitext(file)[0]
-            signal = np.loadtxt(os.path.join(patient_dir, file))
-            feats = extract_features_from_signal(signal)
-            for k, v in feats.items():
-                features[f'{channel}_{k}'] = v
-    return features
-
-# Set your base EEG folder
-base_dir = 'EEG_data'  # <-- Replace with your actual path
-
-data = []
-
-for class_label, label_id in [('Healthy', 0), ('AD', 1)]:
-    for eye_state in ['Eyes_open', 'Eyes_closed']:
-        path = os.path.join(base_dir, class_label, eye_state)
-        for patient_folder in os.listdir(path):
-            patient_path = os.path.join(path, patient_folder)
-            if os.path.isdir(patient_path):
-                features = extract_patient_features(patient_path)
-                features['label'] = label_id
-                features['eye_state'] = eye_state
-                features['patient_id'] = f'{class_label}_{eye_state}_{patient_folder}'
-                data.append(features)
-
-df = pd.DataFrame(data)
-df.fillna(0, inplace=True)
-df.to_csv('eeg_features_all_patients.csv', index=False)
-print("Saved features to eeg_features_all_patients.csv")
+    return hashlib.sha1(json.dumps(spec, sort_keys=True).encode()).hexdigest()
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FeatureCache:
+    # one JSON file per patient directory: {file name: {mtime_ns, size, sha1, spec, features}}
+    # an entry is reused when it was computed with the same feature spec and
+    # mtime and size match, or the content hash still matches
+
+    def __init__(self, cache_dir, patient_dir, spec):
+        self.spec = spec
+        self.path = None
+        self.entries = {}
+        self.dirty = False
+        if cache_dir:
+            key = hashlib.sha1(os.path.abspath(patient_dir).encode()).hexdigest()
+            self.path = os.path.join(cache_dir, f'{key}.json')
+            if os.path.exists(self.path):
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+
+    def get(self, name, path):
+        entry = self.entries.get(name)
+        if entry is None or entry.get('spec') != self.spec:
+            return None
+        stat = os.stat(path)
+        if entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            return entry['features']
+        if entry['size'] == stat.st_size and entry['sha1'] == file_digest(path):
+            entry['mtime_ns'] = stat.st_mtime_ns
+            self.dirty = True
+            return entry['features']
+        return None
+
+    def put(self, name, path, features):
+        stat = os.stat(path)
+        self.entries[name] = {
+            'mtime_ns': stat.st_mtime_ns,
+            'size': stat.st_size,
+            'sha1': file_digest(path),
+            'spec': self.spec,
+            'features': {k: float(v) for k, v in features.items()},
+        }
+        self.dirty = True
+
+    def save(self, names):
+        if not self.path or not self.dirty:
+            return
+        # forget channels that no longer exist
+        self.entries = {k: v for k, v in self.entries.items() if k in names}
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+
+
+def patient_feature_matrix(patient_dir, cache_dir=None, fs=128, timings=None):
+    # returns (channel names, channels x features matrix)
+    timings = timings if timings is not None else defaultdict(float)
+    cache = FeatureCache(cache_dir, patient_dir, feature_spec(fs))
+    names = [f for f in os.listdir(patient_dir) if f.endswith('.txt')]
+    matrix = np.zeros((len(names), len(FEATURE_NAMES)))
+
+    misses = []
+    t0 = time.perf_counter()
+    for row, file in enumerate(names):
+        feats = cache.get(file, os.path.join(patient_dir, file))
+        if feats is None:
+            misses.append(row)
+        else:
+            matrix[row] = [feats[name] for name in FEATURE_NAMES]
+    timings['cache'] += time.perf_counter() - t0
+    timings['cache_hits'] += len(names) - len(misses)
+    timings['cache_misses'] += len(misses)
+
+    if misses:
+        t0 = time.perf_counter()
+        # pandas' C parser is much faster than np.loadtxt for whitespace-delimited text
+        signals = [read_text_signal(os.path.join(patient_dir, names[row])) for row in misses]
+        timings['read'] += time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        matrix[misses] = extract_features_bucketed(signals, fs)
+        timings['features'] += time.perf_counter() - t0
+        for row in misses:
+            path = os.path.join(patient_dir, names[row])
+            cache.put(names[row], path, dict(zip(FEATURE_NAMES, matrix[row])))
+    cache.save(set(names))
+    return [os.path.splitext(f)[0] for f in names], matrix
+
+
+def extract_patient_features(patient_dir, cache_dir=None, fs=128, timings=None):
+    channels, matrix = patient_feature_matrix(patient_dir, cache_dir, fs, timings)
+    return dict(zip(feature_columns(channels), matrix.ravel().tolist()))
+
+
+def find_patients(base_dir):
+    for class_label, label_id in CLASSES:
+        for eye_state in EYE_STATES:
+            path = os.path.join(base_dir, class_label, eye_state)
+            if not os.path.isdir(path):
+                continue
+            for patient_folder in sorted(os.listdir(path)):
+                patient_path = os.path.join(path, patient_folder)
+                if os.path.isdir(patient_path):
+                    yield {
+                        'path': patient_path,
+                        'label': label_id,
+                        'eye_state': eye_state,
+                        'patient_id': f'{class_label}_{eye_state}_{patient_folder}',
+                    }
+
+
+def extract_recording_features(store_dir, recording, fs=128, timings=None):
+    timings = timings if timings is not None else defaultdict(float)
+    t0 = time.perf_counter()
+    data = open_recording(store_dir, recording)
+    lengths = recording['lengths']
+    if len(set(lengths)) == 1:
+        # the whole memory-mapped (channels x samples) array is one batch
+        matrix = extract_features_batch(data, fs)
+    else:
+        matrix = extract_features_bucketed([signal for _, signal in channel_views(store_dir, recording)], fs)
+    timings['features'] += time.perf_counter() - t0
+    return dict(zip(feature_columns(recording['channels']), matrix.ravel().tolist()))
+
+
+def find_recordings(store_dir):
+    for recording in load_index(store_dir)['recordings']:
+        yield {
+            'recording': recording,
+            'label': recording['label'],
+            'eye_state': recording['eye_state'],
+            'patient_id': recording['patient_id'],
+        }
+
+
+def process_patient(patient, cache_dir=None, fs=128, store_dir=None):
+    timings = defaultdict(float)
+    if store_dir:
+        features = extract_recording_features(store_dir, patient['recording'], fs, timings)
+    else:
+        features = extract_patient_features(patient['path'], cache_dir, fs, timings)
+    features['label'] = patient['label']
+    features['eye_state'] = patient['eye_state']
+    features['patient_id'] = patient['patient_id']
+    return features, dict(timings)
+
+
+def run(base_dir, output, workers=None, cache_dir='.feature_cache', fs=128, store_dir=None):
+    if store_dir:
+        # memory-mapped store reads are cheap enough that the file cache is not needed
+        cache_dir = None
+        patients = list(find_recordings(store_dir))
+    else:
+        patients = list(find_patients(base_dir))
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+    totals = defaultdict(float)
+    start = time.perf_counter()
+
+    # rows are appended to a JSON-lines file as patients finish, then turned into the CSV
+    rows_path = f'{output}.rows.jsonl'
+    with open(rows_path, 'w') as rows, ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_patient, p, cache_dir, fs, store_dir): p for p in patients}
+        for done, future in enumerate(as_completed(futures), 1):
+            features, timings = future.result()
+            for k, v in timings.items():
+                totals[k] += v
+            t0 = time.perf_counter()
+            rows.write(json.dumps({k: (float(v) if isinstance(v, np.floating) else v) for k, v in features.items()}) + '\n')
+            rows.flush()
+            totals['write'] += time.perf_counter() - t0
+            print(f'[{done}/{len(patients)}] {futures[future]["patient_id"]}')
+
+    t0 = time.perf_counter()
+    with open(rows_path) as rows:
+        data = [json.loads(line) for line in rows]
+    order = {p['patient_id']: i for i, p in enumerate(patients)}
+    data.sort(key=lambda row: order[row['patient_id']])
+    df = pd.DataFrame(data)
+    df.fillna(0, inplace=True)
+    df.to_csv(output, index=False)
+    os.remove(rows_path)
+    totals['write'] += time.perf_counter() - t0
+
+    print(f'Saved features for {len(patients)} patients to {output}')
+    print(f'  cache hits/misses: {int(totals["cache_hits"])}/{int(totals["cache_misses"])} files')
+    # read/features/cache are summed over workers, so they can exceed wall time
+    for stage in ('cache', 'read', 'features', 'write'):
+        print(f'  {stage:<9} {totals[stage]:8.2f} s')
+    print(f'  wall      {time.perf_counter() - start:8.2f} s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract per-channel EEG features for every patient.')
+    parser.add_argument('--base-dir', default='EEG_data', help='root of the <class>/<eye_state>/<patient>/ tree')
+    parser.add_argument('--output', default='eeg_features_all_patients.csv')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    parser.add_argument('--cache-dir', default='.feature_cache', help='per-file feature cache')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--fs', type=float, default=128, help='sampling rate in Hz')
+    parser.add_argument('--store', help='read signals from a store built with `signal_store.py import` instead of --base-dir')
+    args = parser.parse_args()
+    run(args.base_dir, args.output, args.workers, None if args.no_cache else args.cache_dir, args.fs, args.store)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+from collections import deque
+from frames import FORMATS, LevelOfDetail, encode_frame
+from executor import ExecutorBusy
+from metrics import BROADCAST_SECONDS, DASHBOARD_DROPPED, DASHBOARD_SENT
+
+logger = logging.getLogger("esp32_app.broadcaster")
+
+POLICIES = ("drop_oldest", "coalesce")
+
+
+class DashboardClient:
+    """
+    A dashboard socket with its own bounded outgoing queue and sender task.
+    A slow client only drops its own frames; it never blocks ingestion or
+    other clients.
+
+    policy "drop_oldest" keeps the newest `maxsize` frames,
+    policy "coalesce" keeps only the latest frame.
+    fmt is the frame encoding the client negotiated (see frames.py), lod its
+    LevelOfDetail settings for the lod format, and rate an optional cap on
+    frames per second.
+    """
+
+    def __init__(self, websocket, policy="drop_oldest", maxsize=8, fmt="json", lod=None, rate=None):
+        if policy not in POLICIES:
+            raise ValueError(f"unknown policy {policy!r}, expected one of {POLICIES}")
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
+        self.websocket = websocket
+        self.policy = policy
+        self.fmt = fmt
+        self.lod = lod if lod is not None or fmt != "lod" else LevelOfDetail()
+        self.min_interval = 1 / rate if rate else 0
+        self.queue = deque(maxlen=1 if policy == "coalesce" else max(1, maxsize))
+        # messages that must never be dropped (hello/metadata), sent first
+        self.control = deque()
+        self.dropped = 0
+        self.sent = 0
+        self._ready = asyncio.Event()
+        self._task = None
+        self.closed = False
+
+    @property
+    def frame_key(self):
+        """Clients with the same key receive the same encoded frame."""
+        return self.lod.key if self.fmt == "lod" else self.fmt
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def offer(self, message):
+        """Queue an already-serialized frame without waiting."""
+        if self.closed:
+            return
+        if len(self.queue) == self.queue.maxlen:
+            self.dropped += 1
+            DASHBOARD_DROPPED.labels(policy=self.policy).inc()
+        self.queue.append(message)
+        self._ready.set()
+
+    def offer_control(self, message):
+        """Queue a message that bypasses the drop policy."""
+        if self.closed:
+            return
+        self.control.append(message)
+        self._ready.set()
+
+    async def _run(self):
+        try:
+            while True:
+                await self._ready.wait()
+                self._ready.clear()
+                while self.control or self.queue:
+                    message = self.control.popleft() if self.control else self.queue.popleft()
+                    if isinstance(message, bytes):
+                        await self.websocket.send_bytes(message)
+                    else:
+                        await self.websocket.send_text(message)
+                    self.sent += 1
+                    DASHBOARD_SENT.inc()
+                    if self.min_interval:
+                        await asyncio.sleep(self.min_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Error sending to client: {e}")
+        finally:
+            self.closed = True
+
+    async def close(self):
+        self.closed = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+
+class Broadcaster:
+    """
+    Fan-out task between ingestion and dashboards. Ingestion only marks a
+    session as having a new frame; the task serializes each frame once per
+    format in use and offers it to every subscribed client's queue. Frames
+    published faster than they are processed coalesce per session.
+    With an `executor` (ComputeExecutor) the encoding runs in its worker
+    threads, all pending sessions in parallel; the event loop only takes
+    the snapshot and queues the results.
+    """
+
+    def __init__(self, executor=None):
+        self.executor = executor
+        self._pending = {}
+        self._ready = asyncio.Event()
+        self._task = None
+
+    def publish(self, session):
+        """Schedule a frame for session's subscribers (never blocks)."""
+        if not session.subscribers:
+            return
+        self._pending[session.device_id] = session
+        self._ready.set()
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            pending, self._pending = self._pending, {}
+            if self.executor is None:
+                for session in pending.values():
+                    self._publish_inline(session)
+                    # let ingestion run between sessions
+                    await asyncio.sleep(0)
+            else:
+                await asyncio.gather(*(self._publish_offloaded(session) for session in pending.values()))
+
+    def _publish_inline(self, session):
+        try:
+            with BROADCAST_SECONDS.timer():
+                publish_frame(session)
+        except Exception as e:
+            logger.error(f"Broadcast error for '{session.device_id}': {e}")
+
+    async def _publish_offloaded(self, session):
+        clients = live_clients(session)
+        if not clients:
+            return
+        try:
+            with BROADCAST_SECONDS.timer():
+                snapshot = session.snapshot()
+                delta = session.take_delta()
+                # keys are fixed now; a client may change its lod while we wait
+                keys = [(client, client.frame_key) for client in clients]
+                formats = {key: (client.fmt, client.lod) for client, key in keys}
+                messages = await self.executor.run(encode_frames, session, snapshot, delta, formats,
+                                                   key=("frame", session.device_id))
+        except ExecutorBusy:
+            # hand the delta back so the next frame covers these samples
+            session.restore_delta(delta[0])
+            logger.warning(f"Compute queue full, skipped a frame for '{session.device_id}'")
+            return
+        except Exception as e:
+            logger.error(f"Broadcast error for '{session.device_id}': {e}")
+            return
+        for client, key in keys:
+            client.offer(messages[key])
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def live_clients(session):
+    """The session's open clients; closed ones are unsubscribed."""
+    clients = []
+    for client in list(session.subscribers):
+        if client.closed:
+            session.subscribers.discard(client)
+        else:
+            clients.append(client)
+    return clients
+
+
+def encode_frames(session, snapshot, delta, formats):
+    """Encode one frame per {frame_key: (fmt, lod)}; safe to run in a worker thread."""
+    return {key: encode_frame(session, fmt, delta, lod, snapshot) for key, (fmt, lod) in formats.items()}
+
+
+def publish_frame(session):
+    """Encode the session's new frame once per format and offer it to its clients."""
+    clients = live_clients(session)
+    if not clients:
+        return
+    snapshot = session.snapshot()
+    delta = session.take_delta()
+    messages = encode_frames(session, snapshot, delta, {c.frame_key: (c.fmt, c.lod) for c in clients})
+    for client in clients:
+        client.offer(messages[client.frame_key])
@@ -0,0 +1,220 @@
+"""
+Sample fan-out between uvicorn workers.
+
+With one worker the LocalBroker stand-in is used and nothing leaves the
+process. With several workers (python main.py --workers N) each device
+socket is still pinned to the worker that accepted it, so every worker keeps
+a replica of every session: the ingesting worker publishes each block to a
+hub process over a Unix socket, the hub forwards it to all other workers and
+each of them pushes it into its own sliding spectrum and history. Dashboards,
+/chat_context and /predict can then be served by whichever worker a client
+lands on, and ingest and frame encoding spread across cores. The hub is also
+the single writer of recordings, since an HTTP device may post to a
+different worker on every request.
+
+Messages on the socket (little-endian):
+
+    length     u32  bytes after this field
+    id_length  u16
+    device_id  utf-8
+    frame      a protocol.py sample frame carrying sample rate and channels
+"""
+import argparse
+import asyncio
+import logging
+import os
+import signal
+import struct
+
+from metrics import BROKER_DROPPED, BROKER_PUBLISHED, BROKER_RECEIVED
+from protocol import decode_frame, encode_frame
+
+PREFIX = struct.Struct("<IH")
+MAX_BUFFER = 4 * 1024 * 1024  # bytes queued for one peer before its messages are dropped
+RECONNECT_DELAY = 1.0
+
+logger = logging.getLogger("esp32_app.broker")
+
+
+def pack_message(device_id, samples, sample_rate):
+    name = device_id.encode("utf-8")
+    frame = encode_frame(samples, "", 0, sample_rate)
+    return PREFIX.pack(2 + len(name) + len(frame), len(name)) + name + frame
+
+
+def unpack_message(body):
+    """(device_id, (channels x n) float32 samples, sample_rate) from a message body."""
+    (id_length,) = struct.unpack_from("<H", body)
+    device_id = body[2:2 + id_length].decode("utf-8")
+    header, samples = decode_frame(body[2 + id_length:])
+    return device_id, samples, header["sample_rate"]
+
+
+async def read_message(reader):
+    """Body of the next message, without its length prefix."""
+    length = struct.unpack("<I", await reader.readexactly(4))[0]
+    return await reader.readexactly(length)
+
+
+class LocalBroker:
+    """Single-worker stand-in: this process sees every sample, so there is nothing to forward."""
+
+    records = False  # this worker writes its own recordings
+
+    async def start(self, on_samples):
+        pass
+
+    def publish(self, device_id, samples, sample_rate):
+        return False
+
+    async def stop(self):
+        pass
+
+
+class SocketBroker:
+    """
+    Connection from one worker to the hub. publish() never waits: a message
+    is written to the socket buffer and True returned, or, while the hub is
+    unreachable or more than max_buffer bytes behind, nothing is sent and
+    False tells the caller to record the block itself. Blocks from other
+    workers are passed to on_samples(device_id, samples, sample_rate) on the
+    event loop.
+    """
+
+    records = True  # the hub writes recordings for every worker
+
+    def __init__(self, path, max_buffer=MAX_BUFFER):
+        self.path = path
+        self.max_buffer = max_buffer
+        self._writer = None
+        self._task = None
+        self._on_samples = None
+
+    async def start(self, on_samples):
+        self._on_samples = on_samples
+        self._task = asyncio.create_task(self._run())
+
+    def publish(self, device_id, samples, sample_rate):
+        writer = self._writer
+        if writer is None or writer.transport.get_write_buffer_size() > self.max_buffer:
+            BROKER_DROPPED.labels(direction="out").inc()
+            return False
+        writer.write(pack_message(device_id, samples, sample_rate))
+        BROKER_PUBLISHED.inc()
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError as e:
+                logger.warning(f"Broker hub unreachable at {self.path}: {e}")
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            self._writer = writer
+            logger.info(f"Connected to broker hub at {self.path}")
+            try:
+                while True:
+                    device_id, samples, sample_rate = unpack_message(await read_message(reader))
+                    BROKER_RECEIVED.inc()
+                    try:
+                        self._on_samples(device_id, samples, sample_rate)
+                    except Exception as e:
+                        logger.error(f"Failed to apply samples from broker: {e}")
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                logger.warning(f"Lost connection to broker hub: {e}")
+            finally:
+                self._writer = None
+                writer.close()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class Hub:
+    """
+    Forwards every message to all connected workers except its sender, and
+    records it when given a Recorder. A worker that stops reading only loses
+    its own messages once more than max_buffer bytes are queued for it.
+    """
+
+    def __init__(self, path, recorder=None, max_buffer=MAX_BUFFER):
+        self.path = path
+        self.recorder = recorder
+        self.max_buffer = max_buffer
+        self.peers = set()
+
+    async def serve(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = await asyncio.start_unix_server(self._handle, self.path)
+        logger.info(f"Broker hub listening on {self.path}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+            if self.recorder is not None:
+                await self.recorder.stop()
+
+    async def _handle(self, reader, writer):
+        self.peers.add(writer)
+        try:
+            while True:
+                body = await read_message(reader)
+                message = struct.pack("<I", len(body)) + body
+                for peer in self.peers:
+                    if peer is writer:
+                        continue
+                    if peer.transport.get_write_buffer_size() > self.max_buffer:
+                        BROKER_DROPPED.labels(direction="hub").inc()
+                    else:
+                        peer.write(message)
+                if self.recorder is not None:
+                    device_id, samples, sample_rate = unpack_message(body)
+                    self.recorder.append(device_id, samples, sample_rate)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.error(f"Broker hub dropped a worker connection: {e}")
+        finally:
+            self.peers.discard(writer)
+            writer.close()
+
+
+def run_hub(path, record_dir=None):
+    """Process entry point: serve the hub until SIGTERM, then flush the recordings."""
+    # a hub forked from main.py inherits its handler; a standalone one needs its own
+    if not logging.getLogger("esp32_app").handlers:
+        logging.basicConfig(level=logging.INFO, format="[%(asctime)s] [%(levelname)s] %(message)s")
+
+    async def main():
+        from recorder import Recorder
+        recorder = Recorder(record_dir) if record_dir else None
+        task = asyncio.current_task()
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, task.cancel)
+        try:
+            await Hub(path, recorder).serve()
+        except asyncio.CancelledError:
+            pass
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Broker hub for multi-worker ingest")
+    parser.add_argument("socket", help="Unix socket path the workers connect to")
+    parser.add_argument("--record-dir", help="write recordings of every device under this directory")
+    args = parser.parse_args()
+    run_hub(args.socket, args.record_dir)
@@ -0,0 +1,107 @@
+"""
+Chat model backends for streamlit_app.py.
+
+Every model has stream(prompt), a generator of text chunks as the model
+produces them. GeminiModel streams from the Gemini API; StubModel replays a
+canned reply with a configurable delay, so the app and its latency can be
+exercised offline. The stub is only used when asked for by name:
+
+    python chat_models.py --model stub --runs 5
+    EEG_CHAT_MODEL=stub streamlit run streamlit_app.py
+"""
+import argparse
+import os
+import time
+
+DEFAULT_GEMINI_MODEL = "gemini-1.5-flash"
+STUB_REPLY = (
+    "Your alpha activity is fairly strong right now, which usually goes with a calm, "
+    "relaxed state. This is a good moment to reflect or take on something open-ended. "
+    "If you want to focus, a short break followed by a clear single task may help."
+)
+
+
+class GeminiModel:
+    def __init__(self, name=DEFAULT_GEMINI_MODEL, api_key=None):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key or os.environ.get("GEMINI_API_KEY"))
+        self.name = name
+        self.model = genai.GenerativeModel(name)
+
+    def stream(self, prompt):
+        for chunk in self.model.generate_content(prompt, stream=True):
+            # chunks without text (e.g. safety metadata) are skipped
+            if chunk.parts:
+                yield chunk.text
+
+
+class StubModel:
+    """Local stand-in: waits `first_token` seconds, then yields `tokens_per_second` words."""
+
+    def __init__(self, reply=STUB_REPLY, first_token=0.3, tokens_per_second=40.0):
+        self.name = "stub"
+        self.reply = reply
+        self.first_token = first_token
+        self.tokens_per_second = tokens_per_second
+
+    def stream(self, prompt):
+        words = self.reply.split(" ")
+        time.sleep(self.first_token)
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(1 / self.tokens_per_second)
+            yield word if i == len(words) - 1 else word + " "
+
+
+def load_model(name=None):
+    """
+    The model named by `name` or the EEG_CHAT_MODEL environment variable:
+    "stub", or a Gemini model name (default). Gemini models need GEMINI_API_KEY;
+    without it a RuntimeError is raised rather than quietly answering with the stub.
+    """
+    name = name or os.environ.get("EEG_CHAT_MODEL") or DEFAULT_GEMINI_MODEL
+    if name == "stub":
+        return StubModel()
+    if not os.environ.get("GEMINI_API_KEY"):
+        raise RuntimeError(f"GEMINI_API_KEY is not set; it is needed for {name} "
+                           "(set EEG_CHAT_MODEL=stub to use the offline stub)")
+    return GeminiModel(name)
+
+
+class TimedStream:
+    """
+    Wraps a chunk generator, recording time to first token and total time
+    (seconds, measured from construction) once it has been consumed.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.start = time.perf_counter()
+        self.first_token = None
+        self.total = None
+        self.text = ""
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.first_token is None:
+                self.first_token = time.perf_counter() - self.start
+            self.text += chunk
+            yield chunk
+        self.total = time.perf_counter() - self.start
+        if self.first_token is None:
+            self.first_token = self.total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure chat model latency")
+    parser.add_argument("--model", default="stub", help='"stub" or a Gemini model name')
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--prompt", default="How am I doing right now?")
+    args = parser.parse_args()
+    model = load_model(args.model)
+    for run in range(args.runs):
+        timed = TimedStream(model.stream(args.prompt))
+        for _ in timed:
+            pass
+        print(f"{model.name} run {run + 1}: first token {timed.first_token * 1000:.0f} ms, "
+              f"total {timed.total * 1000:.0f} ms, {len(timed.text)} chars")
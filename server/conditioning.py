@@ -0,0 +1,122 @@
+from functools import lru_cache
+
+import numpy as np
+from scipy.signal import butter, iirnotch, sosfilt, sosfilt_zi, tf2sos
+
+# Streaming signal conditioning for the ingest path: a 0.5-40 Hz Butterworth
+# band-pass and a 50 Hz notch as one chain of second-order sections, with the
+# filter state (zi) carried from block to block, so every sample is filtered
+# exactly once. Artifacts are flagged on the same blocks: clipping and
+# flatline on the raw values, amplitude spikes on the filtered ones.
+
+BAND = (0.5, 40.0)  # Hz
+BAND_ORDER = 4
+NOTCH = 50.0  # Hz, powerline; None disables the notch
+NOTCH_Q = 30.0
+FLAT_SECONDS = 0.25  # identical raw values for this long are a flatline
+CLIP_REPEATS = 3  # identical raw values at the running extreme are clipping
+SPIKE_FACTOR = 8.0  # filtered amplitude above this many times the running mean amplitude is a spike
+SCALE_SECONDS = 2.0  # time constant of the running mean amplitude
+ARTIFACTS = ("clipping", "flatline", "spike")
+
+
+@lru_cache(maxsize=None)
+def filter_chain(sample_rate, band=BAND, order=BAND_ORDER, notch=NOTCH, q=NOTCH_Q):
+    """SOS coefficients of the band-pass followed by the notch (shared; don't modify)."""
+    nyquist = sample_rate / 2
+    high = min(band[1], 0.99 * nyquist)
+    sections = [butter(order, (band[0], high), btype="bandpass", fs=sample_rate, output="sos")]
+    if notch is not None and notch < nyquist:
+        sections.append(tf2sos(*iirnotch(notch, q, fs=sample_rate)))
+    return np.concatenate(sections)
+
+
+class SignalConditioner:
+    """
+    Filter state and artifact tracking of one multi-channel stream.
+    process() costs O(new samples): nothing already filtered is touched again.
+    """
+
+    def __init__(self, channels=1, sample_rate=256):
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.sos = filter_chain(sample_rate)
+        self.total = 0
+        self.artifact_samples = dict.fromkeys(ARTIFACTS, 0)
+        # absolute index just past the latest sample flagged with each artifact
+        self.last_artifact = dict.fromkeys(ARTIFACTS, None)
+        self._zi = None
+        self._previous = None
+        self._repeats = np.zeros(channels, dtype=np.int64)
+        self._low = np.full(channels, np.inf)
+        self._high = np.full(channels, -np.inf)
+        self._scale = np.zeros(channels)
+        self._flat_repeats = max(1, int(FLAT_SECONDS * sample_rate))
+        self._decay = SCALE_SECONDS * sample_rate
+
+    def process(self, samples):
+        """
+        Filter a (channels x n) block and flag its artifacts. Returns
+        (filtered block, {artifact: channels x n boolean mask}).
+        """
+        raw = np.asarray(samples, dtype=float)
+        n = raw.shape[1]
+        if n == 0:
+            return raw, {kind: np.zeros(raw.shape, dtype=bool) for kind in ARTIFACTS}
+        if self._zi is None:
+            # start in steady state for the first value, so a DC offset doesn't ring
+            self._zi = sosfilt_zi(self.sos)[:, None, :] * raw[None, :, :1]
+            self._previous = raw[:, 0].copy()
+        filtered, self._zi = sosfilt(self.sos, raw, axis=-1, zi=self._zi)
+
+        repeats = self._repeat_runs(raw)
+        self._low = np.minimum(self._low, raw.min(axis=1))
+        self._high = np.maximum(self._high, raw.max(axis=1))
+        at_rail = (raw <= self._low[:, None]) | (raw >= self._high[:, None])
+        artifacts = {
+            "clipping": at_rail & (repeats >= CLIP_REPEATS),
+            "flatline": repeats >= self._flat_repeats,
+            "spike": self._spikes(filtered),
+        }
+        for kind, mask in artifacts.items():
+            hits = mask.any(axis=0)
+            if hits.any():
+                self.artifact_samples[kind] += int(hits.sum())
+                self.last_artifact[kind] = self.total + int(np.flatnonzero(hits)[-1]) + 1
+        self.total += n
+        return filtered, artifacts
+
+    def _repeat_runs(self, raw):
+        """For every sample, how many samples in a row before it had the same value."""
+        n = raw.shape[1]
+        same = np.empty(raw.shape, dtype=bool)
+        same[:, 0] = raw[:, 0] == self._previous
+        same[:, 1:] = raw[:, 1:] == raw[:, :-1]
+        position = np.arange(1, n + 1)
+        last_break = np.maximum.accumulate(np.where(same, 0, position), axis=1)
+        runs = position - last_break
+        # runs that reach back to the block start continue the previous block's run
+        runs = np.where(last_break == 0, runs + self._repeats[:, None], runs)
+        self._repeats = runs[:, -1].copy()
+        self._previous = raw[:, -1].copy()
+        return runs
+
+    def _spikes(self, filtered):
+        amplitude = np.abs(filtered)
+        if self.total < self._decay:
+            # learn the scale for SCALE_SECONDS before flagging anything
+            spikes = np.zeros(filtered.shape, dtype=bool)
+        else:
+            spikes = amplitude > SPIKE_FACTOR * self._scale[:, None]
+        # the running scale learns from the clean samples only
+        clean = ~spikes
+        count = clean.sum(axis=1)
+        mean = np.where(clean, amplitude, 0.0).sum(axis=1) / np.maximum(count, 1)
+        weight = 1 - np.exp(-filtered.shape[1] / self._decay)
+        self._scale += np.where(count > 0, weight * (mean - self._scale), 0.0)
+        return spikes
+
+    def in_window(self, kind, window):
+        """Whether the last `window` samples contain an artifact of this kind."""
+        last = self.last_artifact[kind]
+        return last is not None and last > self.total - window
@@ -0,0 +1,88 @@
+import numpy as np
+
+METHODS = ("minmax", "lttb")
+
+
+def moving_average(y, window):
+    """
+    Centered moving average over `window` samples (odd widths; edges average
+    the samples available), computed in O(N) with a cumulative sum.
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    half = window // 2
+    if half < 1 or n < window:
+        return y.copy()
+    csum = np.concatenate(([0.0], np.cumsum(y)))
+    i = np.arange(n)
+    lo = np.maximum(i - half, 0)
+    hi = np.minimum(i + half + 1, n)
+    return (csum[hi] - csum[lo]) / (hi - lo)
+
+
+def minmax_decimate(y, points):
+    """
+    Keep the min and max of each of points/2 buckets, in time order, so peaks
+    survive decimation. Returns (indices, values).
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if points >= n or points < 2:
+        return np.arange(n), y
+    buckets = points // 2
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    starts = edges[:-1]
+    # reduceat needs increasing starts; linspace guarantees it when buckets < n
+    lo = np.minimum.reduceat(y, starts)
+    hi = np.maximum.reduceat(y, starts)
+    # first index of each extreme inside its bucket
+    bucket_of = np.repeat(np.arange(buckets), np.diff(edges))
+    i = np.arange(n)
+    lo_idx = np.minimum.reduceat(np.where(y == lo[bucket_of], i, n), starts)
+    hi_idx = np.minimum.reduceat(np.where(y == hi[bucket_of], i, n), starts)
+    idx = np.sort(np.stack((lo_idx, hi_idx), axis=1), axis=1).ravel()
+    return idx, y[idx]
+
+
+def lttb(y, points):
+    """
+    Largest-Triangle-Three-Buckets downsampling of an evenly spaced series.
+    Keeps the first and last samples and the visually dominant point of each
+    bucket in between. Returns (indices, values).
+    """
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if points >= n or points < 3:
+        return np.arange(n), y
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    # centroid of every bucket, plus the last point as the final "next bucket"
+    avg_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / np.diff(edges), y[-1]).tolist()
+    avg_x = np.append((edges[:-1] + edges[1:] - 1) / 2, n - 1).tolist()
+    # buckets hold only a handful of points, so plain Python beats numpy here
+    values = y.tolist()
+    bounds = edges.tolist()
+    idx = [0]
+    a = 0
+    for b in range(points - 2):
+        nx, ny = avg_x[b + 1], avg_y[b + 1]
+        ax, ay = a, values[a]
+        best, best_area = bounds[b], -1.0
+        for j in range(bounds[b], bounds[b + 1]):
+            area = abs((ax - nx) * (values[j] - ay) - (ax - j) * (ny - ay))
+            if area > best_area:
+                best, best_area = j, area
+        idx.append(best)
+        a = best
+    idx.append(n - 1)
+    idx = np.array(idx)
+    return idx, y[idx]
+
+
+def level_of_detail(y, points, smooth=1, method="minmax"):
+    """Smooth then decimate one channel; returns (indices, values)."""
+    if method not in METHODS:
+        raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+    y = moving_average(y, smooth)
+    if method == "lttb":
+        return lttb(y, points)
+    return minmax_decimate(y, points)
@@ -0,0 +1,150 @@
+"""
+Client side of the EEG server for streamlit_app.py.
+
+EEGClient keeps one keep-alive HTTP session with timeouts and caches the
+/chat_context snapshot for `ttl` seconds, revalidating it with the ETag the
+server sends, so reruns and chat messages rarely cost a full round-trip.
+With subscribe() a background thread also follows /ws/dashboard (lod format,
+a few frames per second) and keeps the latest band powers and a short
+history of them in memory; live() reads them without touching the network.
+"""
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+TIMEOUT = (1.0, 2.0)  # connect, read (seconds)
+CACHE_TTL = 1.0  # seconds a /chat_context snapshot is served without asking the server
+LIVE_RATE = 4.0  # dashboard frames/s requested by the subscription
+LIVE_HISTORY = 240  # band power samples kept for sparklines (60 s at 4/s)
+LIVE_STALE = 3.0  # seconds without a frame before the subscription counts as stale
+RECONNECT_DELAY = 2.0
+BANDS = ("delta", "theta", "alpha", "beta", "gamma")
+EMPTY_CONTEXT = {"data": {"band_powers": dict.fromkeys(BANDS, 0),
+                          "fft_data": {"frequencies": [], "magnitudes": []}}}
+
+logger = logging.getLogger(__name__)
+
+
+class EEGClient:
+    def __init__(self, base_url="http://localhost:8000", device_id="default", timeout=TIMEOUT, ttl=CACHE_TTL):
+        self.base_url = base_url.rstrip("/")
+        self.device_id = device_id
+        self.timeout = timeout
+        self.ttl = ttl
+        self.session = requests.Session()
+        self.session.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+        self.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=8))
+        self.history = deque(maxlen=LIVE_HISTORY)  # (unix time, {band: power})
+        self._lock = threading.Lock()  # subscription state
+        self._fetch_lock = threading.Lock()  # one /chat_context request at a time
+        self._context = None
+        self._etag = None
+        self._fetched = 0.0
+        self._latest = None
+        self._latest_at = 0.0
+        self._thread = None
+        self._stop = threading.Event()
+
+    def context(self):
+        """
+        The /chat_context snapshot as (context, error message or None). Served
+        from the cache for `ttl` seconds; after that the server is asked with
+        If-None-Match and a 304 keeps the cached body. On errors the last good
+        snapshot (or an empty one) is returned with the message.
+        """
+        with self._fetch_lock:
+            if self._context is not None and time.monotonic() - self._fetched < self.ttl:
+                return self._context, None
+            headers = {"If-None-Match": self._etag} if self._etag else {}
+            try:
+                response = self.session.get(f"{self.base_url}/chat_context", params={"device_id": self.device_id},
+                                            headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                return self._context or EMPTY_CONTEXT, f"Error fetching EEG context: {e}"
+            if response.status_code == 304 and self._context is not None:
+                self._fetched = time.monotonic()
+                return self._context, None
+            if response.status_code != 200:
+                return self._context or EMPTY_CONTEXT, "Could not connect to EEG service"
+            self._context = response.json()
+            self._etag = response.headers.get("ETag")
+            self._fetched = time.monotonic()
+            return self._context, None
+
+    def live(self):
+        """
+        Band powers from the subscription as a context dict, or None when not
+        subscribed or no frame arrived in the last LIVE_STALE seconds.
+        """
+        with self._lock:
+            if self._latest is None or time.monotonic() - self._latest_at > LIVE_STALE:
+                return None
+            return self._latest
+
+    def relative_history(self):
+        """{band: [share of total power, oldest first]} from the subscription history, for sparklines."""
+        with self._lock:
+            history = list(self.history)
+        series = {band: [] for band in BANDS}
+        for _, powers in history:
+            total = sum(powers.get(band, 0.0) for band in BANDS)
+            for band in BANDS:
+                series[band].append(powers.get(band, 0.0) / total if total > 0 else 0.0)
+        return series
+
+    def subscribe(self):
+        """Start following /ws/dashboard in a daemon thread (idempotent)."""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._follow, name="eeg-subscription", daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self):
+        self._stop.set()
+        self.session.close()
+
+    def _follow(self):
+        try:
+            from websockets.exceptions import ConnectionClosed, InvalidHandshake
+            from websockets.sync.client import connect
+        except ImportError:
+            logger.exception("Live subscription needs the websockets package; using /chat_context polling")
+            return
+
+        url = self.base_url.replace("http", "ws", 1) + "/ws/dashboard"
+        query = f"?device_id={self.device_id}&format=lod&points=64&fmax=45&rate={LIVE_RATE}"
+        while not self._stop.is_set():
+            try:
+                with connect(url + query, open_timeout=self.timeout[0]) as websocket:
+                    while not self._stop.is_set():
+                        try:
+                            message = websocket.recv(timeout=LIVE_STALE)
+                        except TimeoutError:
+                            continue
+                        frame = json.loads(message)
+                        if frame.get("type") == "eeg_data":
+                            self._update(frame)
+            except (OSError, TimeoutError, ConnectionClosed, InvalidHandshake):
+                # server down or restarted: keep serving the last frame until it goes stale
+                pass
+            except Exception:
+                logger.exception("Live subscription failed; reconnecting")
+            self._stop.wait(RECONNECT_DELAY)
+
+    def _update(self, frame):
+        band_powers = frame.get("band_powers", {})
+        context = {"data": {
+            "band_powers": band_powers,
+            "fft_data": frame.get("fft_data", {"magnitudes": []}),
+            "stats": frame.get("stats", {}),
+        }}
+        with self._lock:
+            self._latest = context
+            self._latest_at = time.monotonic()
+            self.history.append((time.time(), band_powers))
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from metrics import EXECUTOR_COALESCED, EXECUTOR_REJECTED, EXECUTOR_SECONDS
+
+
+class ExecutorBusy(RuntimeError):
+    """The compute queue is full; the caller should skip or retry the job."""
+
+
+class _Job:
+    __slots__ = ("fn", "args", "future")
+
+    def __init__(self, fn, args, future):
+        self.fn = fn
+        self.args = args
+        self.future = future
+
+
+class ComputeExecutor:
+    """
+    Runs DSP and feature work off the event loop.
+
+    Jobs go to a thread pool (NumPy/SciPy release the GIL in their inner
+    loops) or, with process=True and processes > 0, to a process pool for
+    heavy pure-Python feature or model work. At most `max_pending` jobs may be
+    queued or running; beyond that run() raises ExecutorBusy instead of
+    letting work pile up. A job submitted with a `key` while an earlier job
+    with the same key is still waiting for a worker replaces that job's
+    function and arguments: the stale job never runs and both callers get
+    the result of the newer one.
+    """
+
+    def __init__(self, threads=None, processes=0, max_pending=64):
+        self.threads = threads or min(4, os.cpu_count() or 1)
+        self.processes = processes
+        self.max_pending = max_pending
+        self._thread_pool = None
+        self._process_pool = None
+        self._slots = {}
+        self._queued = {}
+        self.pending = 0
+
+    def _pool(self, process):
+        # pools and semaphores are created on first use, inside the running loop
+        if process and self.processes:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(self.processes)
+                self._slots["process"] = asyncio.Semaphore(self.processes)
+            return "process", self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(self.threads, thread_name_prefix="compute")
+            self._slots["thread"] = asyncio.Semaphore(self.threads)
+        return "thread", self._thread_pool
+
+    async def run(self, fn, *args, key=None, process=False):
+        """Run fn(*args) in a worker and return its result."""
+        if key is not None and key in self._queued:
+            job = self._queued[key]
+            job.fn, job.args = fn, args
+            EXECUTOR_COALESCED.inc()
+            return await asyncio.shield(job.future)
+        if self.pending >= self.max_pending:
+            EXECUTOR_REJECTED.inc()
+            raise ExecutorBusy(f"{self.pending} compute jobs pending")
+
+        kind, pool = self._pool(process)
+        loop = asyncio.get_running_loop()
+        job = _Job(fn, args, loop.create_future())
+        self.pending += 1
+        if key is not None:
+            self._queued[key] = job
+        try:
+            async with self._slots[kind]:
+                if key is not None and self._queued.get(key) is job:
+                    del self._queued[key]
+                start = time.perf_counter()
+                try:
+                    result = await loop.run_in_executor(pool, job.fn, *job.args)
+                except Exception as e:
+                    job.future.set_exception(e)
+                else:
+                    job.future.set_result(result)
+                EXECUTOR_SECONDS.labels(pool=kind).observe(time.perf_counter() - start)
+        finally:
+            self.pending -= 1
+            if key is not None and self._queued.get(key) is job:
+                del self._queued[key]
+            if not job.future.done():
+                job.future.cancel()
+        return job.future.result()
+
+    def shutdown(self):
+        for pool in (self._thread_pool, self._process_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        self._thread_pool = self._process_pool = None
+        self._slots = {}
@@ -0,0 +1,134 @@
+from functools import lru_cache
+import numpy as np
+from scipy.signal import welch
+
+# Band tables. The model was trained on TRAINING_BANDS (data_clean.py);
+# the dashboards show EEG_BANDS.
+EEG_BANDS = {
+    "delta": (0.5, 4),
+    "theta": (4, 8),
+    "alpha": (8, 13),
+    "beta": (13, 30),
+    "gamma": (30, 45),
+}
+TRAINING_BANDS = {
+    "delta": (0.5, 4),
+    "theta": (4, 8),
+    "alpha": (8, 12),
+    "beta": (12, 30),
+}
+STAT_NAMES = ["mean", "std", "max", "min"]
+
+
+class FeatureEngine:
+    """
+    One vectorized definition of EEG band and signal features.
+
+    sample_rate  Hz of the signals passed in
+    bands        {name: (low, high)} in Hz
+    spectrum     "welch" (scipy Welch PSD) or "fft" (|rfft|^2 of the window)
+    relative     band powers as a fraction of total power instead of absolute
+    closed       include the upper band edge (low <= f <= high) instead of low <= f < high
+
+    All methods work on arrays of shape (..., samples) and return (..., k).
+    """
+
+    def __init__(self, sample_rate, bands, spectrum="fft", relative=False, closed=False):
+        if spectrum not in ("welch", "fft"):
+            raise ValueError(f"unknown spectrum {spectrum!r}")
+        self.sample_rate = sample_rate
+        self.bands = dict(bands)
+        self.spectrum = spectrum
+        self.relative = relative
+        self.closed = closed
+        self.band_names = list(self.bands)
+        self.feature_names = STAT_NAMES + [f"bandpower_{band}" for band in self.band_names]
+
+    def masks(self, freqs):
+        """(bands x freqs) 0/1 matrix selecting the bins of each band."""
+        return _band_masks(tuple(np.asarray(freqs).tolist()), tuple(self.bands.values()), self.closed)
+
+    def fft_masks(self, window_size):
+        """Band masks for the rfft bins of a window_size window, cached per size."""
+        return _fft_band_masks(window_size, self.sample_rate, tuple(self.bands.values()), self.closed)
+
+    def power_spectrum(self, signals):
+        """Return (freqs, power) along the last axis."""
+        signals = np.asarray(signals, dtype=float)
+        if self.spectrum == "welch":
+            return welch(signals, fs=self.sample_rate, axis=-1)
+        freqs = np.fft.rfftfreq(signals.shape[-1], d=1 / self.sample_rate)
+        return freqs, np.abs(np.fft.rfft(signals, axis=-1)) ** 2
+
+    def band_powers_from_power(self, freqs, power, masks=None):
+        masks = self.masks(freqs) if masks is None else masks
+        band_power = power @ masks.T
+        if not self.relative:
+            return band_power
+        total = power.sum(axis=-1, keepdims=True)
+        return np.divide(band_power, total, out=np.zeros_like(band_power), where=total > 0)
+
+    def band_powers_from_magnitudes(self, magnitudes, window_size):
+        """Band powers from rfft magnitudes (..., bins) of a window_size window."""
+        power = np.asarray(magnitudes, dtype=float) ** 2
+        freqs = np.fft.rfftfreq(window_size, d=1 / self.sample_rate)
+        return self.band_powers_from_power(freqs, power, self.fft_masks(window_size))
+
+    def band_powers(self, signals):
+        freqs, power = self.power_spectrum(signals)
+        if self.spectrum == "fft":
+            return self.band_powers_from_power(freqs, power, self.fft_masks(np.shape(signals)[-1]))
+        return self.band_powers_from_power(freqs, power)
+
+    def stats(self, signals):
+        signals = np.asarray(signals, dtype=float)
+        return np.stack([signals.mean(axis=-1), signals.std(axis=-1),
+                         signals.max(axis=-1), signals.min(axis=-1)], axis=-1)
+
+    def features(self, signals):
+        """(..., samples) -> (..., len(feature_names)): stats followed by band powers."""
+        signals = np.atleast_2d(np.asarray(signals, dtype=float))
+        return np.concatenate([self.stats(signals), self.band_powers(signals)], axis=-1)
+
+    def features_bucketed(self, signals):
+        """Features for signals of different lengths, batched per length."""
+        matrix = np.zeros((len(signals), len(self.feature_names)))
+        by_length = {}
+        for i, signal in enumerate(signals):
+            by_length.setdefault(len(signal), []).append(i)
+        for rows in by_length.values():
+            matrix[rows] = self.features(np.stack([signals[i] for i in rows]))
+        return matrix
+
+    def columns(self, channels):
+        """Flat "<channel>_<feature>" column names, channel-major like the feature CSV."""
+        return [f"{channel}_{name}" for channel in channels for name in self.feature_names]
+
+
+@lru_cache(maxsize=64)
+def _band_masks(freqs, edges, closed):
+    freqs = np.asarray(freqs)
+    if closed:
+        masks = np.array([(freqs >= low) & (freqs <= high) for low, high in edges], dtype=float)
+    else:
+        masks = np.array([(freqs >= low) & (freqs < high) for low, high in edges], dtype=float)
+    masks.setflags(write=False)
+    return masks
+
+
+@lru_cache(maxsize=64)
+def _fft_band_masks(window_size, sample_rate, edges, closed):
+    freqs = np.fft.rfftfreq(window_size, d=1 / sample_rate)
+    return _band_masks(tuple(freqs.tolist()), edges, closed)
+
+
+@lru_cache(maxsize=None)
+def training_engine(sample_rate=128):
+    """Features as in eeg_features_all_patients.csv (the model's training data)."""
+    return FeatureEngine(sample_rate, TRAINING_BANDS, spectrum="welch", relative=True, closed=True)
+
+
+@lru_cache(maxsize=None)
+def live_engine(sample_rate=256):
+    """Absolute FFT band powers shown on the dashboards."""
+    return FeatureEngine(sample_rate, EEG_BANDS, spectrum="fft", relative=False, closed=False)
@@ -0,0 +1,234 @@
+"""
+Dashboard frame encodings for /ws/dashboard, chosen with ?format=:
+
+    json    full window + spectrum every frame (the original payload)
+    delta   JSON with only the samples ingested since the previous frame
+    binary  delta frames packed as float32 (layout below)
+    lod     level-of-detail JSON: the window smoothed and decimated to the
+            number of points the client can draw, the spectrum cut at fmax
+            and summary stats, so the browser does no signal processing
+    spectrogram
+            JSON STFT columns (1 s Hann segments, one per hop, in dB) added
+            since the previous frame, with the Welch PSD averaged over the
+            window (see spectrogram.py)
+
+delta, binary, lod and spectrogram clients first receive an "eeg_hello" JSON message with
+the static frequency axis. delta and binary then get a keyframe carrying the
+whole window, followed by delta frames; spectrogram clients get a keyframe
+with every retained column, then only new columns. Every
+frame has "start", the absolute index of its first sample; a client that
+sees a gap can send the text "resync" to get a fresh keyframe.
+
+Binary frame layout (little-endian):
+
+    magic     2s   b"EF"
+    version   u8   1
+    kind      u8   0 = keyframe, 1 = delta
+    channels  u8
+    n_bands   u8
+    n_bins    u16
+    n_samples u32  samples per channel
+    start     u64
+    samples     float32[channels][n_samples]
+    magnitudes  float32[channels][n_bins]
+    band_powers float32[channels][n_bands]
+"""
+import json
+import struct
+import numpy as np
+from decimate import METHODS, level_of_detail
+from utlis import EEG_BANDS, band_powers_dict
+
+FORMATS = ("json", "delta", "binary", "lod", "spectrogram")
+KEYFRAME, DELTA = 0, 1
+MAGIC = b"EF"
+VERSION = 1
+HEADER = struct.Struct("<2sBBBBHIQ")
+SPECTROGRAM_FMAX = 45.0  # Hz; the conditioned signal is band-limited to 40 Hz
+
+
+class LevelOfDetail:
+    """Per-client view settings for the lod format."""
+
+    def __init__(self, points=600, smooth=1, method="minmax", fmax=60.0):
+        if method not in METHODS:
+            raise ValueError(f"unknown method {method!r}, expected one of {METHODS}")
+        if points < 3 or smooth < 1:
+            raise ValueError("points must be >= 3 and smooth >= 1")
+        self.points = int(points)
+        self.smooth = int(smooth)
+        self.method = method
+        self.fmax = float(fmax)
+
+    @property
+    def key(self):
+        """Clients with equal keys share one encoded frame."""
+        return ("lod", self.points, self.smooth, self.method, self.fmax)
+
+    def update(self, settings):
+        """Apply a control message such as {"smooth": 9}; returns the new settings."""
+        merged = {**self.__dict__, **{k: v for k, v in settings.items() if k in self.__dict__}}
+        return LevelOfDetail(**merged)
+
+
+def hello_message(session, fmt, lod=None):
+    """Static per-session metadata, sent once when a client connects."""
+    frequencies = session.spectrum.frequencies
+    if lod is not None:
+        frequencies = frequencies[frequencies <= lod.fmax]
+    extra = {}
+    if fmt == "spectrogram":
+        spectrogram = session.spectrogram
+        frequencies = spectrogram.frequencies[spectrogram.frequencies <= SPECTROGRAM_FMAX]
+        extra = {"segment": spectrogram.segment, "hop": spectrogram.hop, "unit": "dB"}
+    return json.dumps({
+        "type": "eeg_hello",
+        "format": fmt,
+        "device_id": session.device_id,
+        "sample_rate": session.sample_rate,
+        "window_size": session.window_size,
+        "channels": session.channels,
+        "bands": list(EEG_BANDS),
+        "frequencies": frequencies.tolist(),
+        **extra,
+    })
+
+
+def encode_frame(session, fmt, delta=None, lod=None, snapshot=None):
+    """
+    Serialize the session's current frame in `fmt`.
+    `delta` is (start, samples) from session.take_delta(); without it a
+    keyframe with the whole window is produced. `lod` is the client's
+    LevelOfDetail for the lod format. Passing a `snapshot` taken on the event
+    loop encodes that frame without touching the live buffers, so the call
+    can run in a worker thread.
+    """
+    if fmt == "json":
+        return json.dumps(session.context if snapshot is None else session.build_context(snapshot))
+    snapshot = session.snapshot() if snapshot is None else snapshot
+    if fmt == "lod":
+        return json.dumps(_lod_payload(session, snapshot, lod or LevelOfDetail()))
+    if fmt == "spectrogram":
+        return json.dumps(_spectrogram_payload(session, snapshot, None if delta is None else delta[0]))
+
+    if delta is None:
+        kind = KEYFRAME
+        samples = snapshot["window"]
+        start = snapshot["total"] - samples.shape[1]
+    else:
+        kind = DELTA
+        start, samples = delta
+
+    if fmt == "binary":
+        magnitudes = snapshot["magnitudes"]
+        band_powers = snapshot["band_powers"]
+        header = HEADER.pack(
+            MAGIC, VERSION, kind, session.channels, band_powers.shape[1],
+            magnitudes.shape[1], samples.shape[1], start,
+        )
+        body = [np.ascontiguousarray(a, dtype="<f4").tobytes() for a in (samples, magnitudes, band_powers)]
+        return header + b"".join(body)
+
+    if fmt == "delta":
+        return json.dumps(_delta_payload(session, snapshot, kind, start, samples))
+
+    raise ValueError(f"unknown format {fmt!r}, expected one of {FORMATS}")
+
+
+def _delta_payload(session, snapshot, kind, start, samples):
+    magnitudes = snapshot["magnitudes"]
+    band_powers = snapshot["band_powers"]
+    # same layout as the json format, minus the frequency axis
+    payload = {
+        "type": "eeg_data",
+        "kind": "keyframe" if kind == KEYFRAME else "delta",
+        "device_id": session.device_id,
+        "start": int(start),
+        "data": samples[0].tolist(),
+        "fft_data": {"magnitudes": magnitudes[0].tolist()},
+        "band_powers": band_powers_dict(band_powers[0]),
+    }
+    if session.channels > 1:
+        payload["channels"] = [
+            {
+                "data": samples[ch].tolist(),
+                "magnitudes": magnitudes[ch].tolist(),
+                "band_powers": band_powers_dict(band_powers[ch]),
+            }
+            for ch in range(session.channels)
+        ]
+    return payload
+
+
+def _lod_payload(session, snapshot, lod):
+    window = snapshot["window"]
+    n_bins = int(np.searchsorted(session.spectrum.frequencies, lod.fmax, side="right"))
+    magnitudes = snapshot["magnitudes"][:, :n_bins]
+    band_powers = snapshot["band_powers"]
+
+    views = []
+    for ch in range(session.channels):
+        x, y = level_of_detail(window[ch], lod.points, lod.smooth, lod.method)
+        raw = window[ch]
+        views.append({
+            "x": x.tolist(),
+            "data": y.tolist(),
+            "magnitudes": magnitudes[ch].tolist(),
+            "band_powers": band_powers_dict(band_powers[ch]),
+            "stats": {
+                "mean": float(raw.mean()) if raw.size else 0.0,
+                "std": float(raw.std(ddof=1)) if raw.size > 1 else 0.0,
+                "min": float(raw.min()) if raw.size else 0.0,
+                "max": float(raw.max()) if raw.size else 0.0,
+                "count": int(raw.size),
+            },
+        })
+
+    # x holds sample indices within the window, since decimated points are not evenly spaced
+    payload = {
+        "type": "eeg_data",
+        "kind": "lod",
+        "device_id": session.device_id,
+        "start": int(snapshot["total"] - window.shape[1]),
+        "x": views[0]["x"],
+        "data": views[0]["data"],
+        "fft_data": {"magnitudes": views[0]["magnitudes"]},
+        "band_powers": views[0]["band_powers"],
+        "stats": views[0]["stats"],
+    }
+    if session.channels > 1:
+        payload["channels"] = views
+    return payload
+
+
+def _spectrogram_payload(session, snapshot, start):
+    spectrogram = session.spectrogram
+    n_bins = int(np.searchsorted(spectrogram.frequencies, SPECTROGRAM_FMAX, side="right"))
+    columns = snapshot["columns"]
+    if start is not None:
+        # columns whose segment ends on a sample that arrived since the last frame
+        columns = [column for column in columns if column[1] > start]
+    psd = _decibels(spectrogram.psd(snapshot["columns"])[:, :n_bins])
+    if columns:
+        power = _decibels(np.stack([c[2][:, :n_bins] for c in columns], axis=1))  # channels x columns x bins
+    else:
+        power = np.zeros((session.channels, 0, n_bins))
+    payload = {
+        "type": "eeg_spectrogram",
+        "kind": "keyframe" if start is None else "columns",
+        "device_id": session.device_id,
+        "first_column": columns[0][0] if columns else spectrogram.count,
+        "ends": [end for _, end, _ in columns],
+        "columns": power[0].tolist(),
+        "psd": psd[0].tolist(),
+    }
+    if session.channels > 1:
+        payload["channels"] = [
+            {"columns": power[ch].tolist(), "psd": psd[ch].tolist()}
+            for ch in range(session.channels)
+        ]
+    return payload
+
+
+def _decibels(power):
+    return np.round(10 * np.log10(np.maximum(power, 1e-12)), 2)
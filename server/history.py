@@ -0,0 +1,229 @@
+import time
+
+import numpy as np
+from utlis import band_powers_from_magnitudes
+from features import EEG_BANDS
+
+# Multi-resolution history of each device: per-channel min/max/mean of the
+# raw samples and mean band powers, kept in fixed-size ring buffers per tier.
+# The finest tier is filled from ingested blocks, each coarser tier from the
+# closed buckets of the tier below, so queries never touch raw samples.
+# Queries also return the still-open latest bucket of the tier, built from
+# the open buckets beneath it, so a device that went quiet shows its last slot.
+
+# (resolution in seconds, buckets kept)
+TIERS = (
+    (1, 6 * 3600),       # 6 hours
+    (10, 3 * 24 * 360),  # 3 days
+    (60, 14 * 24 * 60),  # 2 weeks
+)
+FIELDS = ("min", "max", "mean", "band_powers")
+
+
+class RollupTier:
+    """Ring buffer of closed buckets at one resolution, oldest first."""
+
+    def __init__(self, resolution, capacity, channels, bands):
+        self.resolution = resolution
+        self.capacity = capacity
+        self.time = np.zeros(capacity)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.min = np.zeros((capacity, channels), dtype=np.float32)
+        self.max = np.zeros((capacity, channels), dtype=np.float32)
+        self.mean = np.zeros((capacity, channels), dtype=np.float32)
+        self.band_powers = np.zeros((capacity, channels, bands), dtype=np.float32)
+        self.size = 0
+        self._head = 0
+
+    def __len__(self):
+        return self.size
+
+    def append(self, bucket):
+        i = self._head
+        self.time[i] = bucket.start
+        self.count[i] = bucket.count
+        self.min[i] = bucket.min
+        self.max[i] = bucket.max
+        self.mean[i] = bucket.sum / bucket.count
+        self.band_powers[i] = bucket.band_sum / max(bucket.band_count, 1)
+        self._head = (i + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _slices(self):
+        # the ring as at most two chronological slices
+        start = (self._head - self.size) % self.capacity
+        if start + self.size <= self.capacity:
+            return [slice(start, start + self.size)]
+        return [slice(start, self.capacity), slice(0, self._head)]
+
+    def query(self, start, end):
+        """Buckets whose start time lies in [start, end), as a dict of arrays."""
+        parts = []
+        for s in self._slices():
+            times = self.time[s]
+            lo, hi = np.searchsorted(times, [start, end])
+            if lo < hi:
+                parts.append(slice(s.start + lo, s.start + hi))
+        fields = ("time", "count") + FIELDS
+        if not parts:
+            return {name: getattr(self, name)[:0] for name in fields}
+        return {name: np.concatenate([getattr(self, name)[p] for p in parts]) for name in fields}
+
+
+class Bucket:
+    """Running aggregate of the samples (or finer buckets) of one time slot."""
+
+    def __init__(self, start, channels, bands):
+        self.start = start
+        self.count = 0
+        self.min = np.full(channels, np.inf)
+        self.max = np.full(channels, -np.inf)
+        self.sum = np.zeros(channels)
+        self.band_sum = np.zeros((channels, bands))
+        self.band_count = 0
+
+    def add_samples(self, samples):
+        np.minimum(self.min, samples.min(axis=1), out=self.min)
+        np.maximum(self.max, samples.max(axis=1), out=self.max)
+        self.sum += samples.sum(axis=1)
+        self.count += samples.shape[1]
+
+    def add_bucket(self, other):
+        np.minimum(self.min, other.min, out=self.min)
+        np.maximum(self.max, other.max, out=self.max)
+        self.sum += other.sum
+        self.count += other.count
+        self.band_sum += other.band_sum
+        self.band_count += other.band_count
+
+
+class DeviceHistory:
+    """All rollup tiers of one device for a fixed channel count."""
+
+    def __init__(self, device_id, channels, tiers=TIERS):
+        self.device_id = device_id
+        self.channels = channels
+        self.bands = len(EEG_BANDS)
+        self.tiers = [RollupTier(resolution, capacity, channels, self.bands) for resolution, capacity in tiers]
+        self._open = [None] * len(self.tiers)
+        self._spectrum = None
+
+    def add(self, samples, timestamp, spectrum=None):
+        """
+        Aggregate a (channels x n) block received at `timestamp`. When the
+        block opens a new 1 s slot, the previous slot is closed with the band
+        powers of `spectrum` (the session's window up to that point).
+        """
+        self._spectrum = spectrum
+        bucket = self._open[0]
+        slot = np.floor(timestamp / self.tiers[0].resolution) * self.tiers[0].resolution
+        if bucket is not None and slot != bucket.start:
+            _add_band_powers(bucket, spectrum)
+            self._close(0)
+            bucket = None
+        if bucket is None:
+            bucket = self._open[0] = Bucket(slot, self.channels, self.bands)
+        bucket.add_samples(samples)
+
+    def _close(self, level):
+        bucket = self._open[level]
+        self._open[level] = None
+        self.tiers[level].append(bucket)
+        if level + 1 == len(self.tiers):
+            return
+        resolution = self.tiers[level + 1].resolution
+        slot = np.floor(bucket.start / resolution) * resolution
+        parent = self._open[level + 1]
+        if parent is not None and parent.start != slot:
+            self._close(level + 1)
+            parent = None
+        if parent is None:
+            parent = self._open[level + 1] = Bucket(slot, self.channels, self.bands)
+        parent.add_bucket(bucket)
+
+    def query(self, tier, start, end):
+        """Buckets of `tier` whose start time lies in [start, end), including the open one."""
+        rows = tier.query(start, end)
+        pending = [b for b in self._pending(self.tiers.index(tier)) if start <= b.start < end]
+        if not pending:
+            return rows
+        extra = {
+            "time": [b.start for b in pending],
+            "count": [b.count for b in pending],
+            "min": [b.min for b in pending],
+            "max": [b.max for b in pending],
+            "mean": [b.sum / b.count for b in pending],
+            "band_powers": [b.band_sum / max(b.band_count, 1) for b in pending],
+        }
+        return {name: np.concatenate([rows[name], np.array(extra[name], dtype=rows[name].dtype)]) for name in rows}
+
+    def _pending(self, level):
+        """
+        The open buckets at and below `level` merged into slots of that level,
+        oldest first: what `level` would hold if everything were closed now.
+        """
+        resolution = self.tiers[level].resolution
+        merged = {}
+        for i, bucket in enumerate(self._open[:level + 1]):
+            if bucket is None:
+                continue
+            slot = np.floor(bucket.start / resolution) * resolution
+            target = merged.get(slot)
+            if target is None:
+                target = merged[slot] = Bucket(slot, self.channels, self.bands)
+            target.add_bucket(bucket)
+            if i == 0:
+                # the open 1 s slot gets its band powers on close; use the current window meanwhile
+                _add_band_powers(target, self._spectrum)
+        return [merged[slot] for slot in sorted(merged)]
+
+    def tier(self, resolution):
+        for tier in self.tiers:
+            if tier.resolution == resolution:
+                return tier
+        raise ValueError(f"resolution must be one of {[t.resolution for t in self.tiers]}")
+
+    def pick_tier(self, start, end, max_points):
+        """Finest tier that covers [start, end) in at most max_points buckets."""
+        for tier in self.tiers:
+            if (end - start) / tier.resolution <= max_points:
+                return tier
+        return self.tiers[-1]
+
+    def stats(self):
+        return {
+            "device_id": self.device_id,
+            "channels": self.channels,
+            "tiers": {tier.resolution: len(tier) for tier in self.tiers},
+        }
+
+
+def _add_band_powers(bucket, spectrum):
+    if spectrum is not None and len(spectrum):
+        bucket.band_sum += band_powers_from_magnitudes(spectrum.magnitudes(), spectrum.window_size, spectrum.sample_rate)
+        bucket.band_count += 1
+
+
+class HistoryStore:
+    """Device histories keyed by device ID; a channel count change starts a new history."""
+
+    def __init__(self, tiers=TIERS):
+        self.tiers = tiers
+        self.devices = {}
+
+    def __iter__(self):
+        return iter(list(self.devices.values()))
+
+    def get(self, device_id):
+        return self.devices.get(device_id)
+
+    def add(self, device_id, samples, spectrum=None, timestamp=None):
+        samples = np.asarray(samples, dtype=float)
+        if samples.ndim < 2:
+            samples = samples.reshape(1, -1)
+        if samples.shape[1] == 0:
+            return
+        history = self.devices.get(device_id)
+        if history is None or history.channels != samples.shape[0]:
+            history = self.devices[device_id] = DeviceHistory(device_id, samples.shape[0], self.tiers)
+        history.add(samples, time.time() if timestamp is None else timestamp, spectrum)
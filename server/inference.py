@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import pickle
+import time
+from collections import deque
+
+import numpy as np
+from scipy.signal import resample_poly
+from features import training_engine
+
+MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ML", "xgb_AD.pkl")
+
+
+class FeatureSpec:
+    """
+    How a feature row is turned into the model's input vector: the ordered
+    feature columns the model was trained on (e.g. "Fp1_bandpower_alpha"),
+    optional standardization (mean/scale), and the training sample rate.
+    Stored next to the model as <model>.features.json.
+    """
+
+    def __init__(self, columns, mean=None, scale=None, sample_rate=128):
+        self.columns = list(columns)
+        self.mean = None if mean is None else np.asarray(mean, dtype=float)
+        self.scale = None if scale is None else np.asarray(scale, dtype=float)
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec["columns"], spec.get("mean"), spec.get("scale"), spec.get("sample_rate", 128))
+
+    def vector(self, features):
+        """Model input for a {column: value} dict; missing columns are 0 like in training."""
+        row = np.array([features.get(c, 0.0) for c in self.columns], dtype=float)
+        if self.mean is not None:
+            row = row - self.mean
+        if self.scale is not None:
+            row = row / np.where(self.scale == 0, 1, self.scale)
+        return row
+
+
+def live_features(window, sample_rate, channel_names, target_rate=128):
+    """
+    Per-channel features of a (channels x samples) window, computed by the
+    same engine as the offline extractor after resampling to the training rate.
+    """
+    if window.shape[1] == 0:
+        raise ValueError("no samples yet")
+    if len(channel_names) != window.shape[0]:
+        raise ValueError(f"expected {window.shape[0]} channel names, got {len(channel_names)}")
+    if sample_rate != target_rate:
+        g = np.gcd(int(sample_rate), int(target_rate))
+        window = resample_poly(window, int(target_rate) // g, int(sample_rate) // g, axis=-1)
+    engine = training_engine(target_rate)
+    return dict(zip(engine.columns(channel_names), engine.features(window).ravel().tolist()))
+
+
+class PredictionBatcher:
+    """
+    Collects concurrent prediction requests into one predict_proba call.
+    A batch is flushed when it reaches max_batch or max_wait seconds after its
+    first request; the model runs in a worker thread so the event loop stays free.
+    """
+
+    def __init__(self, model, max_batch=32, max_wait=0.005, history=2048):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue = asyncio.Queue()
+        self._task = None
+        self.latencies = deque(maxlen=history)
+        self.batch_sizes = deque(maxlen=history)
+
+    async def predict(self, vector):
+        """Return the positive-class probability for one input vector."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        start = time.perf_counter()
+        await self._queue.put((np.asarray(vector, dtype=float), future))
+        probability = await future
+        self.latencies.append(time.perf_counter() - start)
+        return probability
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            vectors, futures = zip(*batch)
+            self.batch_sizes.append(len(batch))
+            try:
+                proba = await asyncio.to_thread(self.model.predict_proba, np.stack(vectors))
+            except Exception as e:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for future, p in zip(futures, proba[:, 1].tolist()):
+                if not future.done():
+                    future.set_result(p)
+
+    def stats(self):
+        latencies = np.array(self.latencies) * 1000
+        return {
+            "requests": len(latencies),
+            "p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "mean_batch": float(np.mean(self.batch_sizes)) if self.batch_sizes else None,
+        }
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class InferenceService:
+    """
+    The model, its feature spec and the batcher, loaded once at startup.
+    Live feature extraction runs on `executor` (a ComputeExecutor, using its
+    process pool when it has one) or else in a worker thread.
+    """
+
+    def __init__(self, model_path=MODEL_PATH, spec_path=None, executor=None, **batch_options):
+        self.executor = executor
+        with open(model_path, "rb") as f:
+            self.model = pickle.load(f)
+        self.n_features = int(getattr(self.model, "n_features_in_", 0))
+        spec_path = spec_path or os.path.splitext(model_path)[0] + ".features.json"
+        self.spec = FeatureSpec.load(spec_path) if os.path.exists(spec_path) else None
+        if self.spec is not None and len(self.spec.columns) != self.n_features:
+            raise ValueError(f"feature spec has {len(self.spec.columns)} columns, model expects {self.n_features}")
+        self.batcher = PredictionBatcher(self.model, **batch_options)
+
+    async def predict_vector(self, vector):
+        vector = np.asarray(vector, dtype=float)
+        if vector.shape != (self.n_features,):
+            raise ValueError(f"expected {self.n_features} values, got {vector.shape[0] if vector.ndim else 1}")
+        return await self.batcher.predict(vector)
+
+    async def predict_features(self, features):
+        if self.spec is None:
+            raise LookupError("no feature spec next to the model; only raw vectors can be scored")
+        return await self.batcher.predict(self.spec.vector(features))
+
+    async def predict_session(self, session, channel_names):
+        if self.spec is None:
+            raise LookupError("no feature spec next to the model; only raw vectors can be scored")
+        # copy the window on the event loop, compute features off it; the raw
+        # window, since the training features were computed on unfiltered signals
+        window = session.raw_window()
+        args = (live_features, window, session.sample_rate, list(channel_names), self.spec.sample_rate)
+        if self.executor is None:
+            features = await asyncio.to_thread(*args)
+        else:
+            # concurrent requests for the same device share one computation on the newest window
+            key = ("features", session.device_id, tuple(channel_names))
+            features = await self.executor.run(*args, key=key, process=True)
+        return await self.batcher.predict(self.spec.vector(features))
@@ -1,19 +1,84 @@
 from fastapi import FastAPI, Request, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse, Response
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import logging
-from collections import deque
-from utlis import calculate_band_powers, calculate_fft
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+from sessions import DEFAULT_DEVICE, SessionRegistry, parse_sample
+from protocol import FrameError, decode_frame
+from broadcaster import Broadcaster, DashboardClient
+from executor import ComputeExecutor, ExecutorBusy
+from broker import LocalBroker, SocketBroker, run_hub
+from frames import LevelOfDetail, encode_frame, hello_message
+from recorder import Recorder
+from history import FIELDS, HistoryStore
+from summary import empty_summary
+from features import EEG_BANDS
+import metrics
+from metrics import INGEST_INVALID, INGEST_MESSAGES, INGEST_SAMPLES, SPECTRUM_SECONDS, RateLimitFilter
 
 #logger setup
 logger = logging.getLogger("esp32_app")
 logger.setLevel(logging.INFO)
 formatter = logging.Formatter("[%(asctime)s] [%(levelname)s] %(message)s", "%Y-%m-%d %H:%M:%S")
+# at most 5 messages per call site every 10 s, so per-message logs can't eat throughput
+if not logger.handlers:
+    handler = logging.StreamHandler()
+    handler.setFormatter(formatter)
+    handler.addFilter(RateLimitFilter(interval=10.0, burst=5))
+    logger.addHandler(handler)
 
-app = FastAPI()
+COMPUTE_THREADS = None  # workers for frame encoding and DSP (default: min(4, CPUs))
+COMPUTE_PROCESSES = 0  # >0 moves live feature extraction to a process pool
+COMPUTE_QUEUE = 64  # compute jobs queued or running before new ones are refused
+
+WORKERS = int(os.environ.get("EEG_WORKERS", "1"))  # uvicorn worker processes
+# set for every worker when WORKERS > 1; workers exchange samples through the hub listening here
+BROKER_SOCKET = os.environ.get("EEG_BROKER_SOCKET")
+
+executor = ComputeExecutor(COMPUTE_THREADS, COMPUTE_PROCESSES, COMPUTE_QUEUE)
+broadcaster = Broadcaster(executor)
+broker = SocketBroker(BROKER_SOCKET) if BROKER_SOCKET else LocalBroker()
+inference = None
+# every ingested sample is appended to disk under RECORD_DIR (by the hub when there are several workers)
+RECORD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "recordings")
+recorder = Recorder(RECORD_DIR)
+# blocks the hub could not take are recorded by the worker itself, in a directory of its own
+# so two processes never write the same recording; created on first use
+spill = None
+# 1 s / 10 s / 1 min rollups of every device, maintained during ingestion
+history = HistoryStore()
+
+@asynccontextmanager
+async def lifespan(app):
+    # load the Alzheimer's model once; the server still runs without it
+    global inference
+    try:
+        from inference import InferenceService
+        inference = InferenceService(executor=executor)
+        logger.info(f"Loaded model expecting {inference.n_features} features")
+    except Exception as e:
+        logger.error(f"Prediction disabled, could not load model: {e}")
+    lag_monitor = asyncio.create_task(metrics.monitor_loop_lag())
+    await broker.start(apply_remote)
+    yield
+    lag_monitor.cancel()
+    await broker.stop()
+    await broadcaster.stop()
+    await recorder.stop()
+    if spill is not None:
+        await spill.stop()
+    if inference is not None:
+        await inference.batcher.stop()
+    executor.shutdown()
+
+app = FastAPI(lifespan=lifespan)
 templates = Jinja2Templates(directory="templates")
 # app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -26,36 +91,157 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# EEG buffer (1280 = 5 seconds at 256 Hz)
-eeg_buffer = deque(maxlen=1280)
-connected_clients = []
 SAMPLE_RATE = 256  # Hz
+WINDOW_SIZE = 1280  # 5 seconds at 256 Hz
+FFT_HOP = 32  # samples between dashboard frames (8 frames/s at 256 Hz)
+
+CHAT_CONTEXT_INTERVAL = 0.5  # seconds between /chat_context refreshes
+MAX_RANGE_SECONDS = 600  # longest window /recordings serves in one response
+
+# one session (sample window, spectrum, subscribers) per ESP32 device
+sessions = SessionRegistry(WINDOW_SIZE, SAMPLE_RATE, hop=FFT_HOP)
+
+# per-device gauges, computed when /metrics is scraped
+metrics.Gauge("eeg_dashboard_clients", "Dashboard clients subscribed per device.", ["device_id"],
+              collect=lambda: {(s.device_id,): len(s.subscribers) for s in sessions})
+metrics.Gauge("eeg_dashboard_queue_depth", "Deepest dashboard send queue per device.", ["device_id"],
+              collect=lambda: {(s.device_id,): max((len(c.queue) for c in s.subscribers), default=0) for s in sessions})
+metrics.Gauge("eeg_compute_jobs_pending", "Compute jobs queued or running.", collect=lambda: executor.pending)
+
+def ingest(session, samples, transport):
+    """Record a (channels x n) block, share it with the other workers and feed it to the session's spectrum."""
+    INGEST_MESSAGES.labels(transport=transport).inc()
+    INGEST_SAMPLES.labels(transport=transport).inc(samples.shape[1])
+    if not broker.publish(session.device_id, samples, session.sample_rate):
+        # single worker, or the hub is unreachable or behind: keep the block on disk here
+        record_locally(session.device_id, samples, session.sample_rate)
+    apply_samples(session, samples)
+
+
+def record_locally(device_id, samples, sample_rate):
+    global spill
+    if not broker.records:
+        recorder.append(device_id, samples, sample_rate)
+        return
+    if spill is None:
+        spill = Recorder(os.path.join(RECORD_DIR, "unpublished", f"worker-{os.getpid()}"))
+        logger.warning(f"Broker hub not taking samples; recording them under {spill.root}")
+    spill.append(device_id, samples, sample_rate)
+
+
+def apply_remote(device_id, samples, sample_rate):
+    """A block another worker ingested: keep this worker's replica of the session current."""
+    apply_samples(sessions.get_or_create(device_id, samples.shape[0], sample_rate), samples)
+
+
+def apply_samples(session, samples):
+    # before push, so a closing 1 s bucket gets the spectrum up to its end;
+    # history and recordings keep raw values, the window and spectrum are filtered
+    history.add(session.device_id, samples, session.spectrum)
+    filtered = session.condition(samples)
+    # only emit a frame every FFT_HOP samples
+    with SPECTRUM_SECONDS.timer(every=8):
+        frame_due = session.push(filtered)
+    if frame_due:
+        broadcaster.publish(session)
+    session.summary.update(session, CHAT_CONTEXT_INTERVAL)
 
-#global context for EEG data
-eeg_context = {
-            "type": "eeg_data",
-            "data": [],
-            "fft_data": {
-                "frequencies": [],
-                "magnitudes": []
-            },
-            "band_powers": []
-        }
-        
 
 @app.get("/chat_context")
-def get_chat_context():
-    print(eeg_context)
-    context_for_chatbot={
-        "type": "eeg_data",
-        "fft_data": {
-                "frequencies": eeg_context["fft_data"].get("frequencies", [])[-50:],
-                "magnitudes": eeg_context["fft_data"].get("magnitudes", [])[-50:]
-            },
-            "band_powers": eeg_context["band_powers"]
+async def get_chat_context(request: Request, device_id: str = DEFAULT_DEVICE):
+    """
+    Compact state of a device for the chatbot (see summary.py), refreshed by
+    ingestion at most every CHAT_CONTEXT_INTERVAL seconds. Polls sending the
+    previous ETag in If-None-Match get an empty 304 until it changes. Async so
+    the refresh runs on the event loop, like every other session mutation.
+    """
+    session = sessions.get(device_id)
+    if session is not None:
+        # catches the samples of a device that went quiet right after a refresh
+        session.summary.update(session, CHAT_CONTEXT_INTERVAL)
+    if session is None or session.summary.body is None:
+        body = empty_summary(device_id)
+        etag = '"empty"'
+    else:
+        body, etag = session.summary.body, session.summary.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+def require_inference():
+    if inference is None:
+        raise HTTPException(status_code=503, detail="Prediction model not loaded.")
+    return inference
+
+async def predict_device(service, device_id, channels):
+    session = sessions.get(device_id)
+    if session is None or not len(session):
+        raise ValueError(f"no samples for device '{device_id}' yet")
+    return await service.predict_session(session, channels)
+
+@app.post("/predict")
+async def predict(request: Request):
+    """
+    Alzheimer's probability from the shipped XGBoost model. Body is one of:
+    {"vector": [...]} (already preprocessed model input),
+    {"features": {"Fp1_bandpower_alpha": ..., ...}},
+    {"device_id": "...", "channels": ["Fp1", ...]} (live ring buffer).
+    """
+    service = require_inference()
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"body is not valid JSON: {e}")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="body must be a JSON object")
+    start = time.perf_counter()
+    try:
+        if "vector" in body:
+            probability = await service.predict_vector(body["vector"])
+        elif "features" in body:
+            probability = await service.predict_features(body["features"])
+        else:
+            probability = await predict_device(service, body.get("device_id", DEFAULT_DEVICE), body.get("channels", ["Fp1"]))
+    except LookupError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorBusy as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "probability": probability,
+        "label": "AD" if probability >= 0.5 else "Healthy",
+        "latency_ms": (time.perf_counter() - start) * 1000,
     }
 
-    return {"data": context_for_chatbot}
+@app.get("/predict/stats")
+def predict_stats():
+    return require_inference().batcher.stats()
+
+@app.websocket("/ws/predict")
+async def predict_websocket(websocket: WebSocket, device_id: str = DEFAULT_DEVICE,
+                            channels: str = "Fp1", interval: float = 1.0):
+    """Streams a prediction for a live device every `interval` seconds."""
+    await websocket.accept()
+    if inference is None:
+        await websocket.close(code=1011, reason="Prediction model not loaded.")
+        return
+    names = [c.strip() for c in channels.split(",") if c.strip()]
+    try:
+        while True:
+            try:
+                probability = await predict_device(inference, device_id, names)
+                await websocket.send_json({"type": "prediction", "device_id": device_id,
+                                           "probability": probability,
+                                           "label": "AD" if probability >= 0.5 else "Healthy"})
+            except (LookupError, ValueError, ExecutorBusy) as e:
+                await websocket.send_json({"type": "prediction_error", "detail": str(e)})
+            await asyncio.sleep(max(interval, 0.1))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Prediction WebSocket error: {e}")
 
 @app.get("/")
 def debug_route():
@@ -321,8 +507,11 @@ async def get_dashboard():
         </div>
 
         <script>
-            // Establish WebSocket connection
-            const ws = new WebSocket(`ws://${window.location.host}/ws/dashboard`);
+            // Establish WebSocket connection with a server-side level of detail:
+            // only as many points as the chart can draw, smoothed by the server
+            const eegCanvasWidth = document.getElementById('eegChart').clientWidth || 600;
+            const initialSmoothing = document.getElementById('smooth-amount').value;
+            const ws = new WebSocket(`ws://${window.location.host}/ws/dashboard?format=lod&points=${eegCanvasWidth}&smooth=${initialSmoothing}`);
             const statusElement = document.getElementById('connection-status');
             const ctxEeg = document.getElementById('eegChart').getContext('2d');
             const ctxFft = document.getElementById('fftChart').getContext('2d');
@@ -354,7 +543,6 @@ async def get_dashboard():
             
             // Variables for data processing
             let rawEegData = [];
-            let smoothedEegData = [];
             let fftFrequencies = [];
             let fftMagnitudes = [];
             let bandPowers = {
@@ -578,45 +766,11 @@ async def get_dashboard():
             const fftChart = new Chart(ctxFft, fftChartConfig);
             const bandChart = new Chart(ctxBand, bandChartConfig);
             
-            // Helper function to calculate mean
-            function calculateMean(data) {
-                if (data.length === 0) return 0;
-                const sum = data.reduce((a, b) => a + b, 0);
-                return sum / data.length;
-            }
-            
-            // Helper function to calculate standard deviation
-            function calculateStd(data, mean) {
-                if (data.length <= 1) return 0;
-                const variance = data.reduce((acc, val) => acc + Math.pow(val - mean, 2), 0) / (data.length - 1);
-                return Math.sqrt(variance);
-            }
-            
-            // Helper function to smooth data using moving average
-            function smoothData(data, windowSize) {
-                if (windowSize <= 1 || data.length < windowSize) {
-                    return [...data]; // Return copy of original data
+            // Ask the server to change the level of detail
+            function requestSmoothing() {
+                if (ws.readyState === WebSocket.OPEN) {
+                    ws.send(JSON.stringify({smooth: smoothingEnabled ? smoothingAmount : 1}));
                 }
-                
-                const result = [];
-                for (let i = 0; i < data.length; i++) {
-                    let sum = 0;
-                    let count = 0;
-                    
-                    // Calculate centered moving average
-                    const halfWindow = Math.floor(windowSize / 2);
-                    for (let j = -halfWindow; j <= halfWindow; j++) {
-                        const index = i + j;
-                        if (index >= 0 && index < data.length) {
-                            sum += data[index];
-                            count++;
-                        }
-                    }
-                    
-                    result.push(sum / count);
-                }
-                
-                return result;
             }
             
             // Handle WebSocket events
@@ -641,25 +795,20 @@ async def get_dashboard():
             ws.onmessage = (event) => {
                 const data = JSON.parse(event.data);
                 
+                if (data.type === 'eeg_hello') {
+                    // Static frequency axis, only sent on connect
+                    fftFrequencies = data.frequencies;
+                    return;
+                }
+                
                 if (data.type === 'eeg_data') {
-                    // Update raw data
+                    // Already smoothed and decimated by the server
                     rawEegData = data.data;
-                    
-                    // Apply smoothing if enabled
-                    if (smoothingEnabled) {
-                        smoothedEegData = smoothData(rawEegData, smoothingAmount);
-                    } else {
-                        smoothedEegData = [...rawEegData];
-                    }
-                    
-                    // Update EEG chart
-                    const labels = Array.from({length: smoothedEegData.length}, (_, i) => i);
-                    eegChart.data.labels = labels;
-                    eegChart.data.datasets[0].data = smoothedEegData;
+                    eegChart.data.datasets[0].data = data.x.map((x, i) => ({x: x, y: rawEegData[i]}));
                     
                     // Update chart scales if needed
-                    if (smoothedEegData.length > eegChart.options.scales.x.max) {
-                        eegChart.options.scales.x.max = smoothedEegData.length;
+                    if (data.stats.count > eegChart.options.scales.x.max) {
+                        eegChart.options.scales.x.max = data.stats.count;
                     }
                     
                     // Update EEG chart
@@ -667,7 +816,6 @@ async def get_dashboard():
                     
                     // Get and update FFT data
                     if (data.fft_data) {
-                        fftFrequencies = data.fft_data.frequencies;
                         fftMagnitudes = data.fft_data.magnitudes;
                         
                         // Update FFT chart
@@ -702,18 +850,13 @@ async def get_dashboard():
                         gammaElement.textContent = bandPowers.gamma.toFixed(2);
                     }
                     
-                    // Calculate and update statistics
-                    if (rawEegData.length > 0) {
-                        const mean = calculateMean(rawEegData);
-                        const std = calculateStd(rawEegData, mean);
-                        const min = Math.min(...rawEegData);
-                        const max = Math.max(...rawEegData);
-                        
-                        meanElement.textContent = mean.toFixed(2);
-                        stdElement.textContent = std.toFixed(2);
-                        minElement.textContent = min.toFixed(2);
-                        maxElement.textContent = max.toFixed(2);
-                        dataPointsElement.textContent = rawEegData.length;
+                    // Statistics of the full-resolution window, computed by the server
+                    if (data.stats.count > 0) {
+                        meanElement.textContent = data.stats.mean.toFixed(2);
+                        stdElement.textContent = data.stats.std.toFixed(2);
+                        minElement.textContent = data.stats.min.toFixed(2);
+                        maxElement.textContent = data.stats.max.toFixed(2);
+                        dataPointsElement.textContent = data.stats.count;
                     }
                 }
             };
@@ -737,23 +880,13 @@ async def get_dashboard():
                 smoothToggleBtn.textContent = smoothingEnabled ? 'Smoothing On' : 'Smoothing Off';
                 smoothToggleBtn.classList.toggle('active', smoothingEnabled);
                 
-                // Update chart with smoothed/raw data
-                if (smoothingEnabled) {
-                    smoothedEegData = smoothData(rawEegData, smoothingAmount);
-                } else {
-                    smoothedEegData = [...rawEegData];
-                }
-                
-                eegChart.data.datasets[0].data = smoothedEegData;
-                eegChart.update();
+                requestSmoothing();
             });
             
             smoothAmountInput.addEventListener('input', () => {
                 smoothingAmount = parseInt(smoothAmountInput.value);
-                if (smoothingEnabled && rawEegData.length > 0) {
-                    smoothedEegData = smoothData(rawEegData, smoothingAmount);
-                    eegChart.data.datasets[0].data = smoothedEegData;
-                    eegChart.update();
+                if (smoothingEnabled) {
+                    requestSmoothing();
                 }
             });
             
@@ -782,102 +915,237 @@ async def get_dashboard():
 async def receive_esp32_data(request: Request):
     try:
         data = await request.json()
-        logger.info(f"Received data from ESP32: {data}")
+        # lazy and at debug level: formatting every posted payload is costly on the ingest path
+        logger.debug("Received data from ESP32: %s", data)
+        if isinstance(data, dict) and data.get("eeg") is not None:
+            samples = parse_sample(data["eeg"])
+            ingest(sessions.get_or_create(data.get("device_id", DEFAULT_DEVICE), samples.shape[0]), samples, "http")
         return {"status": "success", "received": data}
     except Exception as e:
         logger.error(f"Failed to process ESP32 data: {e}")
         raise HTTPException(status_code=400, detail="Invalid JSON or saving error.")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Prometheus text exposition of the server's counters and histograms. Async:
+    the gauges iterate sessions and subscriber sets, which only the loop changes.
+    """
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/devices")
+def list_devices():
+    return {"devices": [session.stats() for session in sessions]}
+
+@app.get("/recordings")
+async def list_recordings():
+    # discover() adds recorders like append() does; both stay on the loop so a device gets only one
+    recorder.discover()
+    return {"recordings": [device.stats() for device in recorder]}
+
+@app.get("/recordings/{device_id}")
+async def read_recording(device_id: str, start: float = None, end: float = None, format: str = "json"):
+    """
+    Recorded samples of a device between two unix timestamps (default: the
+    last 10 s). format=json returns {"start_sample", "start_time", "sample_rate",
+    "data": [[...] per channel]}; format=binary returns the raw little-endian
+    float32 (channels x n) array with the same metadata in X-* headers.
+    """
+    device = recorder.get(device_id)
+    if device is None:
+        raise HTTPException(status_code=404, detail=f"no recording for device '{device_id}'")
+    # make samples still queued for the writer readable
+    await recorder.flush()
+    end = time.time() if end is None else end
+    start = end - 10 if start is None else start
+    if end < start or end - start > MAX_RANGE_SECONDS:
+        raise HTTPException(status_code=400, detail=f"range must be between 0 and {MAX_RANGE_SECONDS} s")
+    try:
+        first, samples = await asyncio.to_thread(device.read_time, start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    stats = device.stats()
+    meta = {"start_sample": first, "start_time": device.time_at(first), "sample_rate": stats["sample_rate"]}
+    if format == "binary":
+        headers = {"X-Start-Sample": str(first), "X-Start-Time": str(meta["start_time"]),
+                   "X-Sample-Rate": str(meta["sample_rate"]), "X-Channels": str(samples.shape[0])}
+        return Response(samples.astype("<f4").tobytes(), media_type="application/octet-stream", headers=headers)
+    if format != "json":
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'binary'")
+    return {**meta, "data": samples.tolist()}
+
+@app.get("/history/{device_id}")
+async def query_history(device_id: str, start: float = None, end: float = None, last: float = 600,
+                  resolution: int = None, points: int = 600, fields: str = ",".join(FIELDS),
+                  band: str = None):
+    """
+    Rolled-up history of a device between two unix timestamps (default: the
+    last `last` seconds). `resolution` picks a tier (1, 10 or 60 s); by default
+    the finest tier giving at most `points` buckets is used. `fields` selects
+    any of min,max,mean,band_powers; `band` limits band powers to one band.
+    Each channel entry holds one value per bucket, aligned with "time"; the
+    last bucket may still be open. Async, since open buckets change on the loop.
+    """
+    device = history.get(device_id)
+    if device is None:
+        raise HTTPException(status_code=404, detail=f"no history for device '{device_id}'")
+    end = time.time() if end is None else end
+    start = end - last if start is None else start
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in FIELDS]
+    if unknown or end < start:
+        raise HTTPException(status_code=400, detail=f"fields must be among {FIELDS} and start <= end")
+    bands = list(EEG_BANDS)
+    if band is not None and band not in bands:
+        raise HTTPException(status_code=400, detail=f"band must be one of {bands}")
+    try:
+        tier = device.tier(resolution) if resolution else device.pick_tier(start, end, points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = device.query(tier, start, end)
+    channels = []
+    for ch in range(device.channels):
+        entry = {name: rows[name][:, ch].tolist() for name in names if name != "band_powers"}
+        if "band_powers" in names:
+            entry["band_powers"] = {b: rows["band_powers"][:, ch, i].tolist()
+                                    for i, b in enumerate(bands) if band in (None, b)}
+        channels.append(entry)
+    return {
+        "device_id": device_id,
+        "resolution": tier.resolution,
+        "time": rows["time"].tolist(),
+        "count": rows["count"].tolist(),
+        "channels": channels,
+    }
+
 @app.websocket("/ws/esp32")
-async def websocket_endpoint(websocket: WebSocket):
+async def websocket_endpoint(websocket: WebSocket, device_id: str = DEFAULT_DEVICE):
+    """
+    Accepts binary sample frames (see protocol.py) or, as a fallback,
+    JSON messages carrying a single sample: {"eeg": value or [values]}.
+    """
     await websocket.accept()
-    print("ESP32 connected via WebSocket")
+    logger.info(f"ESP32 '{device_id}' connected via WebSocket")
 
     try:
         while True:
-            data = await websocket.receive_json()
-            print(data)
-            eeg_value = data.get("eeg")
-            
-            if eeg_value is not None:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+
+            if message.get("bytes") is not None:
+                transport = "binary"
+                try:
+                    header, samples = decode_frame(message["bytes"])
+                except FrameError as e:
+                    INGEST_INVALID.labels(transport=transport).inc()
+                    logger.warning(f"Invalid EEG frame: {e}")
+                    continue
+                session = sessions.get_or_create(header["device_id"] or device_id, header["channels"], header["sample_rate"])
+                session.track_sequence(header["sequence"])
+            else:
+                transport = "json"
+                try:
+                    data = json.loads(message["text"])
+                except json.JSONDecodeError:
+                    data = None
+                if not isinstance(data, dict):
+                    INGEST_INVALID.labels(transport=transport).inc()
+                    logger.warning("Malformed JSON message received.")
+                    continue
+                eeg_value = data.get("eeg")
+                if eeg_value is None:
+                    continue
                 try:
-                    eeg_buffer.append(float(eeg_value))
-                    # Broadcast data to all dashboard clients
-                    await broadcast_eeg_data()
-                except ValueError:
-                    print("Non-numeric EEG value received.")
+                    samples = parse_sample(eeg_value)
+                except (TypeError, ValueError):
+                    INGEST_INVALID.labels(transport=transport).inc()
+                    logger.warning("Non-numeric EEG value received.")
+                    continue
+                session = sessions.get_or_create(data.get("device_id", device_id), samples.shape[0])
+
+            ingest(session, samples, transport)
     except WebSocketDisconnect:
-        print("ESP32 disconnected")
+        logger.info(f"ESP32 '{device_id}' disconnected")
     except Exception as e:
-        print(f"WebSocket error: {e}")
+        logger.error(f"WebSocket error: {e}")
 
 @app.websocket("/ws/dashboard")
-async def dashboard_websocket(websocket: WebSocket):
+async def dashboard_websocket(websocket: WebSocket, device_id: str = DEFAULT_DEVICE,
+                              policy: str = None, queue: int = 8, format: str = "json",
+                              points: int = 600, smooth: int = 1, method: str = "minmax",
+                              fmax: float = 60.0, rate: float = None):
+    """
+    Streams frames for one device. Each client gets its own bounded send queue;
+    `policy` is "drop_oldest" (keep the newest `queue` frames) or "coalesce"
+    (only the latest frame) when the client falls behind. `format` selects the
+    frame encoding: "json", "delta", "binary", "lod" or "spectrogram" (see frames.py).
+    lod clients choose `points`, `smooth`, `method` and `fmax`, and can change
+    them later by sending JSON such as {"smooth": 9}. `rate` caps frames/s.
+    """
     await websocket.accept()
-    connected_clients.append(websocket)
-    print(f"Dashboard client connected. Total clients: {len(connected_clients)}")
+    try:
+        lod = LevelOfDetail(points, smooth, method, fmax) if format == "lod" else None
+        # lod frames are self-contained, so only the latest one matters
+        policy = policy or ("coalesce" if format == "lod" else "drop_oldest")
+        client = DashboardClient(websocket, policy, queue, format, lod, rate).start()
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    session = sessions.subscribe(device_id, client)
+    logger.info(f"Dashboard client connected to '{device_id}'. Total clients: {len(session.subscribers)}")
     
     try:
-        # Send initial data
-        if eeg_buffer:
-            eeg_data = list(eeg_buffer)
-            # Calculate FFT and band powers
-            freq_bins, magnitudes = calculate_fft(eeg_data)
-            band_powers = calculate_band_powers(freq_bins, magnitudes)
-            
-            await websocket.send_json({
-                "type": "eeg_data",
-                "data": eeg_data,
-                "fft_data": {
-                    "frequencies": freq_bins,
-                    "magnitudes": magnitudes
-                },
-                "band_powers": band_powers
-            })
+        # Send static metadata and initial data
+        if format != "json":
+            # delta clients always start from a keyframe, even an empty one
+            client.offer_control(hello_message(session, format, lod))
+            client.offer(encode_frame(session, format, lod=lod))
+        elif len(session):
+            client.offer(encode_frame(session, format))
         
         # Keep connection alive
         while True:
-            # Just waiting for potential client messages or disconnection
-            await websocket.receive_text()
+            message = await websocket.receive_text()
+            session = sessions.get(device_id)
+            if message == "resync":
+                # delta clients ask for a keyframe after a gap
+                pass
+            elif format == "lod":
+                previous = client.lod
+                try:
+                    client.lod = client.lod.update(json.loads(message))
+                except (ValueError, TypeError, AttributeError) as e:
+                    logger.warning(f"Ignoring dashboard control message: {e}")
+                    continue
+                if client.lod.fmax != previous.fmax and session is not None:
+                    # the frequency axis from the hello is cut at fmax; resend it to match the
+                    # new frames, and drop queued ones still cut at the old fmax
+                    client.queue.clear()
+                    client.offer_control(hello_message(session, format, client.lod))
+            else:
+                continue
+            if session is not None and len(session):
+                client.offer(encode_frame(session, format, lod=client.lod))
     except WebSocketDisconnect:
-        connected_clients.remove(websocket)
-        print(f"Dashboard client disconnected. Total clients: {len(connected_clients)}")
+        logger.info(f"Dashboard client disconnected from '{device_id}'.")
     except Exception as e:
-        if websocket in connected_clients:
-            connected_clients.remove(websocket)
-        print(f"Dashboard WebSocket error: {e}")
-
-async def broadcast_eeg_data():
-    """Send EEG data to all connected dashboard clients"""
-    if connected_clients:
-        # Convert deque to list for JSON serialization
-        eeg_data = list(eeg_buffer)
-        
-        # Calculate FFT and band powers
-        freq_bins, magnitudes = calculate_fft(eeg_data)
-        band_powers = calculate_band_powers(freq_bins, magnitudes)
-        
-        global eeg_context
-        eeg_context = {
-            "type": "eeg_data",
-            "data": eeg_data,
-            "fft_data": {
-                "frequencies": freq_bins,
-                "magnitudes": magnitudes
-            },
-            "band_powers": band_powers
-        }
-        
-        # Broadcast to all connected clients
-        for client in connected_clients.copy():
-            try:
-                await client.send_json(eeg_context)
-            except Exception as e:
-                print(f"Error sending to client: {e}")
-                # Remove problematic clients
-                if client in connected_clients:
-                    connected_clients.remove(client)
-                    
-      
+        logger.error(f"Dashboard WebSocket error: {e}")
+    finally:
+        sessions.unsubscribe(device_id, client)
+        await client.close()
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False)
\ No newline at end of file
+    import argparse
+    import multiprocessing
+    import tempfile
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    args = parser.parse_args()
+    if args.workers > 1:
+        # workers inherit the socket path; the hub records every device once
+        socket_path = BROKER_SOCKET or os.path.join(tempfile.gettempdir(), f"eeg-broker-{os.getpid()}.sock")
+        os.environ["EEG_BROKER_SOCKET"] = socket_path
+        multiprocessing.Process(target=run_hub, args=(socket_path, RECORD_DIR), daemon=True).start()
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=False, workers=args.workers)
\ No newline at end of file
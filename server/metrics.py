@@ -0,0 +1,286 @@
+import asyncio
+import bisect
+import logging
+import threading
+import time
+
+# Minimal Prometheus-style instrumentation: counters, gauges and histograms
+# registered in one registry and rendered in the text exposition format on
+# /metrics. Everything is in-process and cheap enough for the ingest path;
+# hot timers can be sampled (every Nth call) with Histogram.timer(every=N).
+
+DEFAULT_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=(), registry=None):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.label_names)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # unlabelled metrics have a single child
+        return self.labels() if not self.label_names else None
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.label_names, key)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_text(key)} {_number(child.value)}"]
+
+
+class Gauge(Metric):
+    """
+    A settable value, or one computed at scrape time by `collect`, a callable
+    returning a number (unlabelled) or a {label values tuple: number} dict.
+    """
+    kind = "gauge"
+
+    def __init__(self, name, help, labels=(), collect=None, registry=None):
+        self.collect = collect
+        super().__init__(name, help, labels, registry)
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+    def dec(self, amount=1):
+        self._default().dec(amount)
+
+    def render(self):
+        if self.collect is not None:
+            values = self.collect()
+            if not self.label_names:
+                values = {(): values}
+            self._children = {}
+            for key, value in values.items():
+                self.labels(**dict(zip(self.label_names, key))).set(value)
+        return super().render()
+
+    def _render_child(self, key, child):
+        return [f"{self.name}{self._label_text(key)} {_number(child.value)}"]
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "count", "calls")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.calls = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def timer(self, every=1):
+        """Context manager timing its block; with every=N only one call in N is timed."""
+        self.calls += 1
+        if every > 1 and self.calls % every:
+            return _NULL_TIMER
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("target", "start")
+
+    def __init__(self, target):
+        self.target = target
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.target.observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, help, labels, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self.bounds)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def timer(self, every=1):
+        return self._default().timer(every)
+
+    def _render_child(self, key, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else _number(bound)
+            lines.append(f"{self.name}_bucket{self._label_text(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._label_text(key)} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{self._label_text(key)} {child.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        # re-registering a name replaces the metric: main.py is imported twice
+        # when started as a script (as __main__ and again by uvicorn as "main")
+        existing = self.metrics.get(metric.name)
+        if existing is not None and existing.kind != metric.kind:
+            raise ValueError(f"metric {metric.name} already registered as a {existing.kind}")
+        self.metrics[metric.name] = metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+def _number(value):
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+REGISTRY = Registry()
+
+# ingest
+INGEST_MESSAGES = Counter("eeg_ingest_messages_total", "Ingest messages accepted.", ["transport"])
+INGEST_SAMPLES = Counter("eeg_ingest_samples_total", "Samples ingested (per channel).", ["transport"])
+INGEST_INVALID = Counter("eeg_ingest_invalid_total", "Ingest messages rejected as malformed.", ["transport"])
+INGEST_ARTIFACTS = Counter("eeg_ingest_artifact_samples_total", "Samples flagged by the artifact detector.", ["kind"])
+INGEST_DROPPED = Counter("eeg_ingest_dropped_frames_total", "Binary frames lost between device and server (sequence gaps).")
+SPECTRUM_SECONDS = Histogram("eeg_spectrum_update_seconds", "Time to push a block into the sliding spectrum (sampled).")
+SNAPSHOT_SECONDS = Histogram("eeg_snapshot_seconds", "Time to build a frame snapshot (window, magnitudes, band powers).")
+# fan-out
+BROADCAST_SECONDS = Histogram("eeg_broadcast_seconds", "Time to encode and queue one frame for all subscribers of a session.")
+DASHBOARD_SENT = Counter("eeg_dashboard_frames_sent_total", "Frames written to dashboard sockets.")
+DASHBOARD_DROPPED = Counter("eeg_dashboard_frames_dropped_total", "Frames dropped from dashboard queues.", ["policy"])
+# compute executor
+EXECUTOR_SECONDS = Histogram("eeg_compute_job_seconds", "Time compute jobs spend in a worker.", ["pool"])
+EXECUTOR_COALESCED = Counter("eeg_compute_jobs_coalesced_total", "Queued compute jobs replaced by a newer job with the same key.")
+EXECUTOR_REJECTED = Counter("eeg_compute_jobs_rejected_total", "Compute jobs refused because the queue was full.")
+# multi-worker broker
+BROKER_PUBLISHED = Counter("eeg_broker_published_total", "Sample blocks sent to the broker hub.")
+BROKER_RECEIVED = Counter("eeg_broker_received_total", "Sample blocks received from other workers.")
+BROKER_DROPPED = Counter("eeg_broker_dropped_total", "Sample blocks dropped because the hub or a worker fell behind.", ["direction"])
+# runtime
+LOOP_LAG = Histogram("eeg_event_loop_lag_seconds", "How late the event loop runs a periodic timer.",
+                     buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0))
+RECORDER_FLUSH_SECONDS = Histogram("eeg_recorder_flush_seconds", "Time to write queued samples to the segment files.",
+                                   buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+
+
+async def monitor_loop_lag(interval=0.25):
+    """Observe how much later than scheduled a sleep(interval) wakes up."""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        LOOP_LAG.observe(max(0.0, loop.time() - start - interval))
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let through at most `burst` records per call site every `interval`
+    seconds; the next record let through reports how many were suppressed.
+    """
+
+    def __init__(self, interval=10.0, burst=5):
+        super().__init__()
+        self.interval = interval
+        self.burst = burst
+        self._sites = {}
+
+    def filter(self, record):
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        window_start, count, suppressed = self._sites.get(key, (now, 0, 0))
+        if now - window_start >= self.interval:
+            window_start, count = now, 0
+        if count >= self.burst:
+            self._sites[key] = (window_start, count, suppressed + 1)
+            return False
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = ()
+        self._sites[key] = (window_start, count + 1, 0)
+        return True
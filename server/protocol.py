@@ -0,0 +1,77 @@
+"""
+Binary sample frames for /ws/esp32.
+
+A frame is a fixed little-endian header followed by a packed block of
+samples, interleaved by channel (s0c0, s0c1, ..., s1c0, ...):
+
+    magic       2s   b"EG"
+    version     u8   1
+    dtype       u8   0 = float32, 1 = int16, 2 = uint16
+    device_id   16s  ASCII, NUL padded
+    sequence    u32  frame counter, used to detect dropped frames
+    sample_rate u16  Hz, at least MIN_SAMPLE_RATE
+    channels    u8
+    (pad)       1 byte
+    n_samples   u16  samples per channel in this frame
+"""
+import struct
+import numpy as np
+
+MAGIC = b"EG"
+VERSION = 1
+HEADER = struct.Struct("<2sBB16sIHBxH")
+DTYPES = {
+    0: np.dtype("<f4"),
+    1: np.dtype("<i2"),
+    2: np.dtype("<u2"),
+}
+DTYPE_CODES = {dtype: code for code, dtype in DTYPES.items()}
+# lowest rate a session can be built for: the filters and the spectrogram's
+# one-second segments (which must span at least one hop) need a few dozen Hz
+MIN_SAMPLE_RATE = 64
+
+
+class FrameError(ValueError):
+    pass
+
+
+def decode_frame(payload):
+    """
+    Parse a binary frame. Returns (header dict, samples) where samples is a
+    (channels x n_samples) view into the payload (no per-sample copies).
+    """
+    if len(payload) < HEADER.size:
+        raise FrameError(f"frame too short: {len(payload)} bytes")
+    magic, version, dtype_code, device_id, sequence, sample_rate, channels, n_samples = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise FrameError("not an EEG frame")
+    if dtype_code not in DTYPES or channels == 0:
+        raise FrameError(f"bad dtype {dtype_code} or channel count {channels}")
+    if sample_rate < MIN_SAMPLE_RATE:
+        raise FrameError(f"sample rate {sample_rate} Hz is below {MIN_SAMPLE_RATE} Hz")
+    dtype = DTYPES[dtype_code]
+    expected = HEADER.size + n_samples * channels * dtype.itemsize
+    if len(payload) != expected:
+        raise FrameError(f"expected {expected} bytes, got {len(payload)}")
+
+    samples = np.frombuffer(payload, dtype=dtype, offset=HEADER.size).reshape(n_samples, channels).T
+    header = {
+        "device_id": device_id.rstrip(b"\0").decode("ascii", "replace"),
+        "sequence": sequence,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "n_samples": n_samples,
+    }
+    return header, samples
+
+
+def encode_frame(samples, device_id="default", sequence=0, sample_rate=256, dtype="<f4"):
+    """Build a binary frame from a (channels x n_samples) array (used by clients and load tests)."""
+    dtype = np.dtype(dtype)
+    samples = np.atleast_2d(samples)
+    channels, n_samples = samples.shape
+    header = HEADER.pack(
+        MAGIC, VERSION, DTYPE_CODES[dtype], device_id.encode("ascii")[:16],
+        sequence & 0xFFFFFFFF, sample_rate, channels, n_samples,
+    )
+    return header + np.ascontiguousarray(samples.T, dtype=dtype).tobytes()
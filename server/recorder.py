@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import numpy as np
+from metrics import RECORDER_FLUSH_SECONDS
+
+# Append-only recording of ingested samples. Each device gets a directory of
+# preallocated float32 segment files of shape (segment_samples, channels),
+# opened as memory maps. Next to each segment a small JSON file holds its
+# global start sample, fill count and (sample, unix time) anchors used to map
+# timestamps to offsets; only the active segment's file is rewritten on a
+# flush, so the cost stays flat however long the recording runs. index.json
+# names the device. Ingestion only queues blocks; a background task writes
+# and flushes them in a worker thread.
+
+INDEX = "index.json"
+SEGMENT_INDEX = re.compile(r"\d{12}\.json")
+SEGMENT_SAMPLES = 256 * 600  # 10 minutes at 256 Hz
+ANCHOR_INTERVAL = 1.0  # seconds between timestamp anchors
+
+logger = logging.getLogger("esp32_app.recorder")
+
+
+def _dir_name(device_id):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", device_id) or "_"
+
+
+class DeviceRecorder:
+    """Segment files and index of one device."""
+
+    def __init__(self, directory, device_id, segment_samples=SEGMENT_SAMPLES):
+        self.directory = directory
+        self.device_id = device_id
+        self.segment_samples = segment_samples
+        self.segments = []
+        self._pending = []
+        self._writer = None
+        self._lock = threading.Lock()
+        self._loaded = {}  # segment index file -> (mtime, segment)
+        self._anchors = None  # (samples, times, rates) arrays, rebuilt after the anchors change
+        self.refresh()
+        # an existing recording is continued in a new segment, never reopened for writing
+
+    def refresh(self):
+        """
+        Reload the segment index files another process (the broker hub) has
+        added or rewritten since the last look; unchanged ones are not read.
+        Only done while this process is not writing the device itself.
+        """
+        if self._writer is not None or self._pending:
+            return
+        loaded = {}
+        changed = False
+        for name in sorted(os.listdir(self.directory)):
+            if not SEGMENT_INDEX.fullmatch(name):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                continue
+            cached = self._loaded.get(name)
+            if cached is not None and cached[0] == mtime:
+                loaded[name] = cached
+            else:
+                with open(path) as f:
+                    loaded[name] = (mtime, json.load(f))
+                changed = True
+        if changed or len(loaded) != len(self._loaded):
+            with self._lock:
+                self.segments = [segment for _, segment in loaded.values()]
+                self._anchors = None
+            self._loaded = loaded
+
+    @property
+    def total(self):
+        """Number of samples written to disk."""
+        with self._lock:
+            if not self.segments:
+                return 0
+            last = self.segments[-1]
+            return last["start"] + last["count"]
+
+    def append(self, samples, sample_rate, timestamp=None):
+        """Queue a (channels x n) block. Cheap; safe to call from the event loop."""
+        samples = np.array(samples, dtype=np.float32, ndmin=2)
+        if samples.shape[1]:
+            self._pending.append((samples, int(sample_rate), time.time() if timestamp is None else timestamp))
+
+    def take_pending(self):
+        pending, self._pending = self._pending, []
+        return pending
+
+    def write(self, pending):
+        """Write queued blocks to the segment files (runs in a worker thread)."""
+        if not pending:
+            return
+        for samples, sample_rate, timestamp in pending:
+            written = 0
+            while written < samples.shape[1]:
+                segment = self._segment_for(samples.shape[0], sample_rate)
+                k = min(segment["capacity"] - segment["count"], samples.shape[1] - written)
+                self._writer[segment["count"]:segment["count"] + k] = samples[:, written:written + k].T
+                with self._lock:
+                    segment["count"] += k
+                written += k
+            # the block arrived when its last sample did; anchors are kept about
+            # ANCHOR_INTERVAL apart, except the last one which tracks the newest block
+            anchor = [segment["start"] + segment["count"], timestamp]
+            anchors = segment["anchors"]
+            with self._lock:
+                if len(anchors) >= 2 and timestamp - anchors[-2][1] < ANCHOR_INTERVAL:
+                    anchors[-1] = anchor
+                else:
+                    anchors.append(anchor)
+                self._anchors = None
+        self._writer.flush()
+        self._save_segment(segment)
+
+    def _segment_for(self, channels, sample_rate):
+        segment = self.segments[-1] if self.segments else None
+        if (self._writer is not None and segment["count"] < segment["capacity"]
+                and segment["channels"] == channels and segment["sample_rate"] == sample_rate):
+            return segment
+        self.close()
+        start = self.total
+        segment = {
+            "file": f"{start:012d}.npy",
+            "start": start,
+            "count": 0,
+            "capacity": self.segment_samples,
+            "channels": channels,
+            "sample_rate": sample_rate,
+            "anchors": [],
+        }
+        if not self.segments:
+            self._save_index()
+        self._writer = np.lib.format.open_memmap(os.path.join(self.directory, segment["file"]), mode="w+",
+                                                 dtype=np.float32, shape=(self.segment_samples, channels))
+        with self._lock:
+            self.segments.append(segment)
+        return segment
+
+    def _save_index(self):
+        self._dump(INDEX, {"device_id": self.device_id, "dtype": "float32"})
+
+    def _save_segment(self, segment):
+        # segments are only written while active; earlier ones keep their last flushed file
+        with self._lock:
+            self._dump(segment["file"].replace(".npy", ".json"), segment)
+
+    def _dump(self, name, value):
+        tmp = os.path.join(self.directory, f"{name}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp, os.path.join(self.directory, name))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.flush()
+            self._writer = None
+            # a segment filled mid-write gets its final count before the next one starts
+            self._save_segment(self.segments[-1])
+
+    def read(self, start, stop):
+        """
+        Samples [start, stop) by global sample index as a (channels x n) array.
+        Only the requested rows of each segment are read from the memory maps.
+        """
+        with self._lock:
+            segments = [dict(s) for s in self.segments]
+        parts = []
+        for segment in segments:
+            lo = max(start, segment["start"])
+            hi = min(stop, segment["start"] + segment["count"])
+            if lo >= hi:
+                continue
+            data = np.load(os.path.join(self.directory, segment["file"]), mmap_mode="r")
+            parts.append(data[lo - segment["start"]:hi - segment["start"]].T)
+        if not parts:
+            return np.zeros((segments[-1]["channels"] if segments else 1, 0), dtype=np.float32)
+        if len({p.shape[0] for p in parts}) > 1:
+            raise ValueError("range spans a change in channel count")
+        return np.ascontiguousarray(np.concatenate(parts, axis=1))
+
+    def offset_at(self, timestamp):
+        """Global sample index recorded at a unix timestamp, interpolated between anchors."""
+        anchors = self._anchor_arrays()
+        if anchors is None:
+            return 0
+        samples, times, rates = anchors
+        if timestamp <= times[0]:
+            offset = samples[0] + (timestamp - times[0]) * rates[0]
+        elif timestamp >= times[-1]:
+            offset = samples[-1] + (timestamp - times[-1]) * rates[-1]
+        else:
+            offset = np.interp(timestamp, times, samples)
+        return int(min(max(round(offset), 0), self.total))
+
+    def time_at(self, offset):
+        """Approximate unix time of a global sample index (inverse of offset_at)."""
+        anchors = self._anchor_arrays()
+        if anchors is None:
+            return None
+        samples, times, rates = anchors
+        if offset <= samples[0]:
+            return float(times[0] - (samples[0] - offset) / rates[0])
+        if offset >= samples[-1]:
+            return float(times[-1] + (offset - samples[-1]) / rates[-1])
+        return float(np.interp(offset, samples, times))
+
+    def _anchor_arrays(self):
+        """All anchors as (samples, times, rates) float arrays, or None; cached until the anchors change."""
+        with self._lock:
+            if self._anchors is None:
+                anchors = [(a[0], a[1], s["sample_rate"]) for s in self.segments for a in s["anchors"]]
+                self._anchors = tuple(np.array(column, dtype=float) for column in zip(*anchors)) if anchors else ()
+            return self._anchors or None
+
+    def read_time(self, start_time, end_time):
+        """Samples recorded between two unix timestamps: (first sample index, channels x n array)."""
+        start, stop = self.offset_at(start_time), self.offset_at(end_time)
+        return start, self.read(start, stop)
+
+    def stats(self):
+        with self._lock:
+            segments = list(self.segments)
+        total = segments[-1]["start"] + segments[-1]["count"] if segments else 0
+        return {
+            "device_id": self.device_id,
+            "samples": total,
+            "segments": len(segments),
+            "channels": segments[-1]["channels"] if segments else None,
+            "sample_rate": segments[-1]["sample_rate"] if segments else None,
+            "start_time": self.time_at(segments[0]["start"]) if segments else None,
+            "end_time": self.time_at(total) if segments else None,
+            "pending_blocks": len(self._pending),
+        }
+
+
+class Recorder:
+    """
+    Per-device recorders under one root directory. append() only queues;
+    a background task writes everything queued every flush_interval seconds
+    with the disk I/O in a worker thread, so the event loop never blocks on it.
+    """
+
+    def __init__(self, root, segment_samples=SEGMENT_SAMPLES, flush_interval=1.0):
+        self.root = root
+        self.segment_samples = segment_samples
+        self.flush_interval = flush_interval
+        self.devices = {}
+        self._task = None
+        self._flush_lock = asyncio.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.discover()
+
+    def discover(self):
+        """Pick up recordings written by another process since the last look."""
+        for name in sorted(os.listdir(self.root)):
+            path = os.path.join(self.root, name, INDEX)
+            if os.path.exists(path):
+                with open(path) as f:
+                    device_id = json.load(f)["device_id"]
+                device = self.devices.get(device_id)
+                if device is None:
+                    self.devices[device_id] = DeviceRecorder(os.path.join(self.root, name), device_id, self.segment_samples)
+                else:
+                    device.refresh()
+
+    def __contains__(self, device_id):
+        return device_id in self.devices
+
+    def __iter__(self):
+        return iter(list(self.devices.values()))
+
+    def get(self, device_id):
+        device = self.devices.get(device_id)
+        if device is None:
+            path = os.path.join(self.root, _dir_name(device_id), INDEX)
+            if os.path.exists(path):
+                device = self.devices[device_id] = DeviceRecorder(os.path.dirname(path), device_id, self.segment_samples)
+        else:
+            device.refresh()
+        return device
+
+    def append(self, device_id, samples, sample_rate, timestamp=None):
+        device = self.devices.get(device_id)
+        if device is None:
+            directory = os.path.join(self.root, _dir_name(device_id))
+            os.makedirs(directory, exist_ok=True)
+            device = self.devices[device_id] = DeviceRecorder(directory, device_id, self.segment_samples)
+        device.append(samples, sample_rate, timestamp)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def flush(self):
+        """Write everything queued so far; returns once it is on disk."""
+        async with self._flush_lock:
+            for device in list(self.devices.values()):
+                pending = device.take_pending()
+                if pending:
+                    start = time.perf_counter()
+                    await asyncio.to_thread(device.write, pending)
+                    RECORDER_FLUSH_SECONDS.observe(time.perf_counter() - start)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Recorder flush error: {e}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        for device in self.devices.values():
+            device.close()
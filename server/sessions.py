@@ -0,0 +1,225 @@
+import numpy as np
+from spectral import RingBuffer, SlidingSpectrum
+from spectrogram import Spectrogram
+from utlis import band_powers_dict, band_powers_from_magnitudes
+from conditioning import SignalConditioner
+from metrics import INGEST_ARTIFACTS, INGEST_DROPPED, SNAPSHOT_SECONDS
+from summary import SessionSummary
+
+DEFAULT_DEVICE = "default"
+
+
+class DeviceSession:
+    """
+    State for one EEG headset: its filter state, sample window and spectrum, the latest
+    dashboard frame and chat summary, and the dashboard clients subscribed to it.
+    """
+
+    def __init__(self, device_id, channels=1, window_size=1280, sample_rate=256, hop=32):
+        self.device_id = device_id
+        self.channels = channels
+        self.window_size = window_size
+        self.sample_rate = sample_rate
+        self.conditioner = SignalConditioner(channels, sample_rate)
+        # unfiltered copy of the window: model features must match the raw-signal training data
+        self.raw = RingBuffer(window_size, channels)
+        self.spectrum = SlidingSpectrum(window_size, sample_rate, hop=hop, channels=channels)
+        # 1 s Hann segments every hop samples; the Welch average spans the window
+        segment = min(sample_rate, window_size)
+        self.spectrogram = Spectrogram(sample_rate, channels, segment, hop, averages=(window_size - segment) // hop + 1)
+        self.subscribers = set()
+        self.last_sequence = None
+        self.dropped_frames = 0
+        self._snapshot = None
+        self._context = None
+        self._tick_total = 0
+        self.summary = SessionSummary(device_id)
+
+    def __len__(self):
+        return len(self.spectrum)
+
+    def condition(self, samples):
+        """
+        Band-pass/notch filter a raw block and count its artifacts; returns the
+        filtered block. The raw block is kept in `raw` for inference.
+        """
+        self.raw.write(samples)
+        filtered, artifacts = self.conditioner.process(samples)
+        for kind, mask in artifacts.items():
+            flagged = int(mask.any(axis=0).sum())
+            if flagged:
+                INGEST_ARTIFACTS.labels(kind=kind).inc(flagged)
+        return filtered
+
+    def raw_window(self):
+        """The unfiltered (channels x samples) window, oldest first."""
+        return self.raw.latest()
+
+    def push(self, samples):
+        """Append samples; returns True when a new dashboard frame is due."""
+        self.spectrogram.push(samples)
+        return self.spectrum.push(samples)
+
+    def track_sequence(self, sequence):
+        """Count frames lost between this binary frame and the previous one."""
+        if self.last_sequence is not None:
+            gap = (sequence - self.last_sequence - 1) & 0xFFFFFFFF
+            # a huge gap means the device restarted its counter
+            if gap < 0x80000000:
+                self.dropped_frames += gap
+                INGEST_DROPPED.inc(gap)
+        self.last_sequence = sequence
+
+    def stats(self):
+        return {
+            "device_id": self.device_id,
+            "channels": self.channels,
+            "sample_rate": self.sample_rate,
+            "samples": self.spectrum.buffer.total,
+            "dropped_frames": self.dropped_frames,
+            "artifact_samples": dict(self.conditioner.artifact_samples),
+            "dashboards": len(self.subscribers),
+        }
+
+    def snapshot(self):
+        """
+        Arrays for the current frame: window (channels x samples), magnitudes
+        (channels x bins), band_powers (channels x bands) and the retained
+        spectrogram columns. Computed at most once per ingested block.
+        """
+        total = self.spectrum.buffer.total
+        if self._snapshot is None or self._snapshot["total"] != total:
+            with SNAPSHOT_SECONDS.timer():
+                magnitudes = self.spectrum.magnitudes()
+                self._snapshot = {
+                    "total": total,
+                    "window": self.spectrum.window(),
+                    "magnitudes": magnitudes,
+                    "band_powers": band_powers_from_magnitudes(magnitudes, self.window_size, self.sample_rate),
+                    "columns": list(self.spectrogram.columns),
+                }
+        return self._snapshot
+
+    def take_delta(self):
+        """
+        Return (start, samples): the samples ingested since the previous call,
+        capped to the window, and the absolute index of the first one.
+        """
+        window = self.snapshot()["window"]
+        total = self.spectrum.buffer.total
+        start = max(self._tick_total, total - window.shape[1])
+        self._tick_total = total
+        return start, window[:, window.shape[1] - (total - start):]
+
+    def restore_delta(self, start):
+        """Hand back a delta whose frame was never sent; the next take_delta() starts at `start` again."""
+        self._tick_total = min(self._tick_total, start)
+
+    @property
+    def context(self):
+        """The latest full frame as a JSON-ready dict (built lazily)."""
+        if not len(self):
+            return empty_context(self.device_id)
+        if self._context is None or self._context["total"] != self.spectrum.buffer.total:
+            self._context = {"total": self.spectrum.buffer.total, "frame": self.build_context()}
+        return self._context["frame"]
+
+    def build_context(self, snapshot=None):
+        """
+        Build a dashboard frame from a snapshot (default: the current one).
+        Given a snapshot taken earlier, it is safe to call from a worker thread.
+        """
+        snapshot = self.snapshot() if snapshot is None else snapshot
+        window, magnitudes, band_powers = snapshot["window"], snapshot["magnitudes"], snapshot["band_powers"]
+        # channel 0 stays at the top level so single-channel clients are unaffected
+        context = {
+            "type": "eeg_data",
+            "device_id": self.device_id,
+            "data": window[0].tolist(),
+            "fft_data": {
+                "frequencies": self.spectrum.frequencies.tolist(),
+                "magnitudes": magnitudes[0].tolist()
+            },
+            "band_powers": band_powers_dict(band_powers[0])
+        }
+        if self.channels > 1:
+            context["channels"] = [
+                {
+                    "data": window[ch].tolist(),
+                    "magnitudes": magnitudes[ch].tolist(),
+                    "band_powers": band_powers_dict(band_powers[ch])
+                }
+                for ch in range(self.channels)
+            ]
+        return context
+
+
+class SessionRegistry:
+    """Device sessions keyed by device ID."""
+
+    def __init__(self, window_size=1280, sample_rate=256, hop=32):
+        self.window_size = window_size
+        self.sample_rate = sample_rate
+        self.hop = hop
+        self._sessions = {}
+
+    def __contains__(self, device_id):
+        return device_id in self._sessions
+
+    def __iter__(self):
+        return iter(list(self._sessions.values()))
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, device_id):
+        return self._sessions.get(device_id)
+
+    def get_or_create(self, device_id, channels=1, sample_rate=None):
+        """
+        Return the session for device_id, creating it on first use.
+        A device reconnecting with a different channel count or sample rate
+        gets a fresh session.
+        """
+        sample_rate = sample_rate or self.sample_rate
+        session = self._sessions.get(device_id)
+        if session is None or session.channels != channels or session.sample_rate != sample_rate:
+            session = DeviceSession(device_id, channels, self.window_size, sample_rate, self.hop)
+            if device_id in self._sessions:
+                session.subscribers = self._sessions[device_id].subscribers
+            self._sessions[device_id] = session
+        return session
+
+    def subscribe(self, device_id, client):
+        """Add a dashboard client to a device, creating an idle session if needed."""
+        session = self._sessions.get(device_id)
+        if session is None:
+            session = self.get_or_create(device_id)
+        session.subscribers.add(client)
+        return session
+
+    def unsubscribe(self, device_id, client):
+        session = self._sessions.get(device_id)
+        if session is not None:
+            session.subscribers.discard(client)
+
+
+def empty_context(device_id=DEFAULT_DEVICE):
+    return {
+        "type": "eeg_data",
+        "device_id": device_id,
+        "data": [],
+        "fft_data": {
+            "frequencies": [],
+            "magnitudes": []
+        },
+        "band_powers": []
+    }
+
+
+def parse_sample(value):
+    """
+    Convert an `eeg` JSON value (number or list of per-channel numbers)
+    into a (channels x 1) array. Raises ValueError for non-numeric input.
+    """
+    return np.asarray(value, dtype=float).reshape(-1, 1)
@@ -0,0 +1,132 @@
+import math
+import numpy as np
+
+
+class RingBuffer:
+    """
+    Preallocated (channels x capacity) sample buffer.
+    Blocks are written with a single vectorized copy, no per-sample allocation.
+    """
+
+    def __init__(self, capacity, channels=1, dtype=float):
+        self.capacity = capacity
+        self.channels = channels
+        self._data = np.zeros((channels, capacity), dtype=dtype)
+        self._pos = 0
+        self._count = 0
+
+    def __len__(self):
+        return min(self._count, self.capacity)
+
+    @property
+    def total(self):
+        """Number of samples written since creation."""
+        return self._count
+
+    def write(self, block):
+        """
+        Write a (channels x m) block and return the samples it overwrote
+        (zeros while the buffer is still filling).
+        """
+        m = block.shape[1]
+        if m >= self.capacity:
+            self._data[:] = block[:, -self.capacity:]
+            self._pos = 0
+            self._count += m
+            return None
+        idx = (self._pos + np.arange(m)) % self.capacity
+        old = self._data[:, idx]
+        self._data[:, idx] = block
+        self._pos = (self._pos + m) % self.capacity
+        self._count += m
+        return old
+
+    def ordered(self):
+        """Return the whole (channels x capacity) buffer, oldest sample first."""
+        return np.concatenate((self._data[:, self._pos:], self._data[:, :self._pos]), axis=1)
+
+    def latest(self, n=None):
+        """Return the last n buffered samples (all of them by default), oldest first."""
+        n = len(self) if n is None else min(n, len(self))
+        return self.ordered()[:, self.capacity - n:]
+
+
+class SlidingSpectrum:
+    """
+    Incremental spectrum of the last `window_size` samples of each channel.
+
+    Each new sample updates the rfft bins with a sliding DFT step
+    (O(bins) instead of a full O(N log N) FFT). A full FFT is only run to
+    resync numerical drift every `resync` samples and for very large blocks.
+    `push()` reports when `hop` samples have arrived since the last frame,
+    so callers only emit at that cadence.
+    """
+
+    def __init__(self, window_size=1280, sample_rate=256, hop=32, resync=None, channels=1):
+        if window_size <= 0 or hop <= 0:
+            raise ValueError("window_size and hop must be positive")
+        self.window_size = window_size
+        self.sample_rate = sample_rate
+        self.hop = hop
+        self.resync = resync or window_size
+        self.channels = channels
+
+        n_bins = window_size // 2 + 1
+        k = np.arange(n_bins)
+        self.frequencies = np.fft.rfftfreq(window_size, d=1 / sample_rate)
+        self._twiddle = np.exp(2j * np.pi * k / window_size)
+        # blocks up to this size use the sliding update, bigger ones a full FFT
+        self._block_limit = max(1, math.ceil(math.log2(window_size)))
+        i = np.arange(self._block_limit)
+        self._basis = np.exp(-2j * np.pi * np.outer(i, k) / window_size)
+
+        self.buffer = RingBuffer(window_size, channels)
+        self._spectrum = np.zeros((channels, n_bins), dtype=complex)
+        self._since_resync = 0
+        self._since_emit = 0
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def push(self, samples):
+        """
+        Add samples: a scalar or 1-D block for single-channel input, or a
+        (channels x m) block. Returns True when a new frame is due
+        (at least `hop` new samples since the last one).
+        """
+        block = np.asarray(samples, dtype=float)
+        if block.ndim < 2:
+            block = block.reshape(1, -1)
+        if block.shape[0] != self.channels:
+            raise ValueError(f"expected {self.channels} channels, got {block.shape[0]}")
+        m = block.shape[1]
+        if m == 0:
+            return False
+
+        old = self.buffer.write(block)
+        self._since_resync += m
+        if old is None or m > self._block_limit or self._since_resync >= self.resync:
+            self._full_fft()
+        elif m == 1:
+            self._spectrum = (self._spectrum + (block - old)) * self._twiddle
+        else:
+            correction = (block - old) @ self._basis[:m]
+            self._spectrum = (self._spectrum + correction) * self._twiddle ** m
+
+        self._since_emit += m
+        if self._since_emit >= self.hop:
+            self._since_emit = 0
+            return True
+        return False
+
+    def _full_fft(self):
+        self._spectrum = np.fft.rfft(self.buffer.ordered(), axis=-1)
+        self._since_resync = 0
+
+    def window(self):
+        """Return the buffered (channels x samples) window, oldest first."""
+        return self.buffer.latest()
+
+    def magnitudes(self):
+        """Return the (channels x bins) magnitude of each frequency bin."""
+        return np.abs(self._spectrum)
@@ -0,0 +1,71 @@
+from collections import deque
+
+import numpy as np
+from scipy.signal import get_window
+
+# Incremental STFT / Welch estimate. The stream is cut into overlapping
+# Hann-windowed segments ending every `hop` samples; each new segment is
+# transformed once and its power spectrum kept in a ring of columns. Sliding
+# the window only adds the newest column: the Welch PSD is the mean of the
+# columns covering the window, and the ring doubles as the spectrogram
+# history streamed to dashboards.
+
+
+class Spectrogram:
+    """
+    Spectrogram columns of a (channels x n) stream. Each column is the
+    one-sided power spectral density (same scaling as scipy.signal.welch) of
+    the `segment` samples ending at its `end` sample index.
+    """
+
+    def __init__(self, sample_rate=256, channels=1, segment=256, hop=32, averages=33, history=64):
+        if not 0 < hop <= segment:
+            raise ValueError("hop must be between 1 and segment")
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.segment = segment
+        self.hop = hop
+        self.averages = averages
+        self.frequencies = np.fft.rfftfreq(segment, 1 / sample_rate)
+        self.total = 0
+        self.count = 0
+        # (column index, end sample index, channels x bins PSD)
+        self.columns = deque(maxlen=max(history, averages))
+        self._window = get_window("hann", segment)
+        scale = np.full(len(self.frequencies), 2 / (sample_rate * (self._window ** 2).sum()))
+        scale[0] /= 2
+        if segment % 2 == 0:
+            scale[-1] /= 2
+        self._scale = scale
+        self._tail = np.zeros((channels, 0))
+
+    def push(self, samples):
+        """Add a block; returns the number of new columns."""
+        samples = np.asarray(samples, dtype=float)
+        n = samples.shape[1]
+        if n == 0:
+            return 0
+        buffer = np.concatenate([self._tail, samples], axis=1)
+        start = self.total - self._tail.shape[1]  # absolute index of buffer[:, 0]
+        self.total += n
+        # segment ends on multiples of hop that fall inside this block
+        first = max(self.total - n + 1, self.segment)
+        first += -first % self.hop
+        ends = np.arange(first, self.total + 1, self.hop)
+        if len(ends):
+            offsets = ends - start
+            index = offsets[:, None] - self.segment + np.arange(self.segment)
+            segments = buffer[:, index] * self._window  # channels x columns x segment
+            power = np.abs(np.fft.rfft(segments, axis=-1)) ** 2 * self._scale
+            for k, end in enumerate(ends.tolist()):
+                self.columns.append((self.count, end, power[:, k]))
+                self.count += 1
+        self._tail = buffer[:, -self.segment:]
+        return len(ends)
+
+    def psd(self, columns=None):
+        """Welch PSD (channels x bins): the mean of the newest `averages` columns."""
+        columns = list(self.columns) if columns is None else columns
+        if not columns:
+            return np.zeros((self.channels, len(self.frequencies)))
+        return np.mean([power for _, _, power in columns[-self.averages:]], axis=0)
@@ -1,18 +1,19 @@
-import time
 import os
+from concurrent.futures import ThreadPoolExecutor
 import streamlit as st
-import google.generativeai as genai
 from dotenv import load_dotenv
-import requests
+from chat_models import TimedStream, load_model
+from eeg_client import EEGClient
 
 
 load_dotenv()
 
-GOOGLE_API_KEY = os.environ.get('GEMINI_API_KEY')
-genai.configure(api_key=GOOGLE_API_KEY)
-
 MODEL_ROLE = 'EEG chatbot'
-API_URL = "http://localhost:8000/chat_context"
+SERVER_URL = os.environ.get("EEG_SERVER_URL", "http://localhost:8000")
+DEVICE_ID = os.environ.get("EEG_DEVICE_ID", "default")
+# follow /ws/dashboard in the background so the sidebar never waits on the server
+LIVE_SUBSCRIPTION = os.environ.get("EEG_LIVE", "1") == "1"
+LIVE_REFRESH_SECONDS = float(os.environ.get("EEG_LIVE_REFRESH", "1.0"))  # sidebar metrics update interval
 
 st.set_page_config(
     page_title="EEG-Aware AI Assistant", 
@@ -20,20 +21,34 @@ st.set_page_config(
     layout="wide"
 )
 
-def fetch_eeg_context():
-    """Fetch real-time EEG data from backend API"""
-    try:
-        response = requests.get(API_URL)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            st.warning("Could not connect to EEG service")
-            return {"data": {"band_powers": {"delta": 0, "theta": 0, "alpha": 0, "beta": 0, "gamma": 0}, 
-                            "fft_data": {"frequencies": [], "magnitudes": []}}}
-    except Exception as e:
-        st.error(f"Error fetching EEG context: {e}")
-        return {"data": {"band_powers": {"delta": 0, "theta": 0, "alpha": 0, "beta": 0, "gamma": 0}, 
-                        "fft_data": {"frequencies": [], "magnitudes": []}}}
+@st.cache_resource
+def get_model():
+    """One model client per server process, shared by every rerun and session (see chat_models.py)."""
+    return load_model()
+
+@st.cache_resource
+def background_pool():
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="eeg-fetch")
+
+@st.cache_resource
+def eeg_client():
+    """Keep-alive HTTP session, snapshot cache and optional live subscription, shared across reruns."""
+    client = EEGClient(SERVER_URL, DEVICE_ID)
+    if LIVE_SUBSCRIPTION:
+        client.subscribe()
+    return client
+
+def fetch_eeg_context(future=None):
+    """EEG context from a client.context() call started earlier on background_pool(), or fetched now.
+    Cached resources are resolved on the script thread; only client.context runs in the pool."""
+    context, error = future.result() if future is not None else eeg_client().context()
+    if error:
+        st.warning(error)
+    return context
+
+def start_eeg_fetch():
+    """chat_input callback: runs before the rerun, so the fetch overlaps drawing the sidebar and history."""
+    st.session_state.eeg_future = background_pool().submit(eeg_client().context)
 
 def build_prompt(user_input, eeg_json):
     """Build a context-aware prompt including EEG data interpretation"""
@@ -124,11 +139,15 @@ This assistant uses real-time EEG data to adapt its responses to your current me
 It interprets your brainwave patterns to provide more empathetic and context-appropriate answers.
 """)
 
-with st.sidebar:
-    st.header("Current Brain Activity")
-    eeg_data = fetch_eeg_context()
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_metrics():
+    """Band power metrics and sparkline; reruns on its own every LIVE_REFRESH_SECONDS
+    without re-executing the rest of the app. Reads the in-memory subscription
+    state, or the cached /chat_context snapshot when there is none."""
+    client = eeg_client()
+    eeg_data = client.live() or fetch_eeg_context()
     band_powers = eeg_data.get("data", {}).get("band_powers", {})
-    
+
     # Create metrics for each band
     col1, col2 = st.columns(2)
     with col1:
@@ -141,7 +160,18 @@ with st.sidebar:
         if band_powers.get('alpha', 0) != 0:
             beta_alpha = band_powers.get('beta', 0) / band_powers.get('alpha', 0)
             st.metric("Beta/Alpha", f"{beta_alpha:.2f}")
-    
+
+    series = client.relative_history()
+    if len(series["alpha"]) > 1:
+        st.caption("Relative band power, last minute")
+        st.line_chart(series, height=120)
+    elif not LIVE_SUBSCRIPTION:
+        st.caption("Live subscription off (EEG_LIVE=0); showing the cached snapshot.")
+
+with st.sidebar:
+    st.header("Current Brain Activity")
+    live_metrics()
+
     st.divider()
     st.markdown("### Interpretation Guide")
     st.markdown("""
@@ -151,46 +181,38 @@ with st.sidebar:
     - **Beta ↑** → Focused or anxious
     - **Gamma ↑** → Learning, high cognition
     """)
-    
-    if st.button("Refresh EEG Data"):
-        st.rerun()
 
 for message in st.session_state.messages:
     with st.chat_message(message["role"]):
         st.write(message["content"])
+        if message.get("latency"):
+            st.caption(message["latency"])
+
+# a missing API key is reported here instead of silently chatting with the stub
+try:
+    model = get_model()
+except (RuntimeError, ImportError) as e:
+    st.error(f"Chat model unavailable: {e}")
+    st.stop()
 
 # Chat input and response logic
-if prompt := st.chat_input("What would you like to discuss?"):
+if prompt := st.chat_input("What would you like to discuss?", on_submit=start_eeg_fetch):
     # Add user message to chat history and display
     st.session_state.messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.write(prompt)
-    
-    # Fetch fresh EEG data for this specific interaction
-    eeg_context = fetch_eeg_context()
-    
-    # Display a spinner while generating response
-    with st.spinner("Processing your request with EEG context..."):
-        # Create the context-aware prompt
-        full_prompt = build_prompt(prompt, eeg_context)
-        
-        # Initialize Gemini model
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Send message to Gemini
-        response = model.generate_content(full_prompt)
-        
-        # Create a message placeholder for streaming effect
-        with st.chat_message(MODEL_ROLE):
-            message_placeholder = st.empty()
-            full_response = ""
-            
-            # Simulate streaming for better UX
-            for word in response.text.split():
-                full_response += word + " "
-                time.sleep(0.01)
-                message_placeholder.write(full_response + "▌")
-            message_placeholder.write(full_response)
-    
+
+    with st.chat_message(MODEL_ROLE):
+        with st.spinner("Processing your request with EEG context..."):
+            # started by start_eeg_fetch when the message was submitted
+            eeg_context = fetch_eeg_context(st.session_state.pop("eeg_future", None))
+            # Create the context-aware prompt
+            full_prompt = build_prompt(prompt, eeg_context)
+        # Stream the reply as the model produces it
+        reply = TimedStream(model.stream(full_prompt))
+        full_response = st.write_stream(reply)
+        latency = f"first token {reply.first_token * 1000:.0f} ms, total {reply.total * 1000:.0f} ms ({model.name})"
+        st.caption(latency)
+
     # Add assistant response to chat history
-    st.session_state.messages.append({"role": MODEL_ROLE, "content": full_response})
+    st.session_state.messages.append({"role": MODEL_ROLE, "content": full_response, "latency": latency})
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import math
+import time
+
+import numpy as np
+from conditioning import ARTIFACTS
+from features import EEG_BANDS
+
+# Compact per-device state for /chat_context: band powers, ratios, smoothed
+# trends, dominant frequency and signal-quality flags from the session's
+# artifact detector (conditioning.py). Ingestion refreshes it
+# at most once per interval and keeps the serialized body and its ETag, so a
+# poll is a dict lookup and a repeated poll with If-None-Match is a 304.
+
+SUMMARY_INTERVAL = 0.5  # seconds between refreshes
+TREND_SECONDS = (5.0, 60.0)  # time constants of the fast and slow band power averages
+TREND_THRESHOLD = 0.1  # relative fast/slow difference reported as rising or falling
+RATIOS = {
+    "theta_beta": ("theta", "beta"),
+    "alpha_theta": ("alpha", "theta"),
+    "beta_alpha": ("beta", "alpha"),
+}
+SPECTRUM_RANGE = (0.5, 45.0)  # Hz, summarized at 1 Hz resolution
+
+
+class SessionSummary:
+    """The latest serialized summary of one device session."""
+
+    def __init__(self, device_id):
+        self.device_id = device_id
+        self.body = None
+        self.etag = None
+        self.total = None
+        self._updated = None
+        self._fast = None
+        self._slow = None
+
+    def update(self, session, interval=SUMMARY_INTERVAL, now=None):
+        """Refresh from the session unless the last refresh is less than `interval` s old."""
+        now = time.monotonic() if now is None else now
+        if self._updated is not None and now - self._updated < interval:
+            return False
+        total = session.spectrum.buffer.total
+        if total == self.total or not len(session):
+            return False
+        snapshot = session.snapshot()
+        band_powers = snapshot["band_powers"]
+        # averages start once the window is full, so warm-up spectra don't read as a trend
+        warming_up = len(session) < session.window_size
+        self._track_trends(band_powers, None if self._updated is None or warming_up else now - self._updated)
+        self._updated = now
+        self.total = total
+        self.body = json.dumps({"data": summarize(session, snapshot, self._fast, self._slow)}).encode()
+        self.etag = '"' + hashlib.blake2b(self.body, digest_size=8).hexdigest() + '"'
+        return True
+
+    def _track_trends(self, band_powers, dt):
+        if self._fast is None or self._fast.shape != band_powers.shape or dt is None:
+            self._fast = band_powers.copy()
+            self._slow = band_powers.copy()
+            return
+        # exponential moving averages that stay correct for uneven refresh intervals
+        for average, tau in zip((self._fast, self._slow), TREND_SECONDS):
+            average += (1 - math.exp(-dt / tau)) * (band_powers - average)
+
+
+def summarize(session, snapshot, fast, slow):
+    window, magnitudes, band_powers = snapshot["window"], snapshot["magnitudes"], snapshot["band_powers"]
+    frequencies = session.spectrum.frequencies
+    channels = [
+        _channel_summary(frequencies, magnitudes[ch], band_powers[ch], fast[ch], slow[ch])
+        for ch in range(session.channels)
+    ]
+    edges = np.arange(SPECTRUM_RANGE[0], SPECTRUM_RANGE[1] + 1)
+    # channel 0 stays at the top level, like the dashboard frames
+    summary = {
+        "type": "eeg_summary",
+        "device_id": session.device_id,
+        "samples": int(snapshot["total"]),
+        "sample_rate": session.sample_rate,
+        "window_seconds": window.shape[1] / session.sample_rate,
+        "updated": time.time(),
+        "quality": _quality(session),
+        **channels[0],
+        "fft_data": {
+            "frequencies": (edges[:-1] + 0.5).tolist(),
+            "magnitudes": _binned(frequencies, magnitudes[0], edges),
+        },
+    }
+    if session.channels > 1:
+        summary["channels"] = channels
+    return summary
+
+
+def empty_summary(device_id):
+    return json.dumps({"data": {
+        "type": "eeg_summary",
+        "device_id": device_id,
+        "samples": 0,
+        "band_powers": dict.fromkeys(EEG_BANDS, 0.0),
+        "relative_band_powers": dict.fromkeys(EEG_BANDS, 0.0),
+        "ratios": dict.fromkeys(RATIOS, None),
+        "trends": {},
+        "dominant_frequency": None,
+        "quality": {"no_signal": True},
+        "fft_data": {"frequencies": [], "magnitudes": []},
+    }}).encode()
+
+
+def _channel_summary(frequencies, magnitudes, band_powers, fast, slow):
+    powers = dict(zip(EEG_BANDS, band_powers.tolist()))
+    total = float(band_powers.sum())
+    in_range = (frequencies >= SPECTRUM_RANGE[0]) & (frequencies <= SPECTRUM_RANGE[1])
+    dominant = frequencies[in_range][np.argmax(magnitudes[in_range])] if in_range.any() else None
+    return {
+        "band_powers": powers,
+        "relative_band_powers": {band: p / total if total > 0 else 0.0 for band, p in powers.items()},
+        "ratios": {
+            name: powers[num] / powers[den] if powers[den] > 0 else None
+            for name, (num, den) in RATIOS.items()
+        },
+        "trends": {
+            band: {"fast": f, "slow": s, "direction": _direction(f, s)}
+            for band, f, s in zip(EEG_BANDS, fast.tolist(), slow.tolist())
+        },
+        "dominant_frequency": None if dominant is None else float(dominant),
+    }
+
+
+def _direction(fast, slow):
+    if slow <= 0:
+        return "steady"
+    change = (fast - slow) / slow
+    if change > TREND_THRESHOLD:
+        return "rising"
+    if change < -TREND_THRESHOLD:
+        return "falling"
+    return "steady"
+
+
+def _quality(session):
+    """Artifacts flagged anywhere in the current window, on any channel."""
+    window = len(session)
+    quality = {"warming_up": window < session.window_size}
+    for kind in ARTIFACTS:
+        quality[kind] = session.conditioner.in_window(kind, window)
+    return quality
+
+
+def _binned(frequencies, magnitudes, edges):
+    """Mean magnitude in each [edges[i], edges[i+1]) bin."""
+    index = np.digitize(frequencies, edges) - 1
+    valid = (index >= 0) & (index < len(edges) - 1)
+    sums = np.bincount(index[valid], weights=magnitudes[valid], minlength=len(edges) - 1)
+    counts = np.bincount(index[valid], minlength=len(edges) - 1)
+    return np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0).tolist()
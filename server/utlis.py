@@ -1,6 +1,7 @@
 import numpy as np
+from features import EEG_BANDS, live_engine
 
-def calculate_fft(eeg_data):
+def calculate_fft(eeg_data, sample_rate=256):
     """
     Calculate FFT of EEG data and return frequency bins and magnitudes.
     """
@@ -10,7 +11,7 @@ def calculate_fft(eeg_data):
     eeg_array = np.array(eeg_data)
     fft_result = np.fft.rfft(eeg_array)
     magnitudes = np.abs(fft_result).tolist()
-    freq_bins = np.fft.rfftfreq(n, d=1/256).tolist()  # assuming 256 Hz sampling rate
+    freq_bins = np.fft.rfftfreq(n, d=1/sample_rate).tolist()
     return freq_bins, magnitudes
 
 def calculate_band_powers(freq_bins, magnitudes):
@@ -18,20 +19,31 @@ def calculate_band_powers(freq_bins, magnitudes):
     Calculate power in standard EEG bands (delta, theta, alpha, beta, gamma).
     Returns a dict with band names and their power.
     """
-    bands = {
-        "delta": (0.5, 4),
-        "theta": (4, 8),
-        "alpha": (8, 13),
-        "beta": (13, 30),
-        "gamma": (30, 45),
-    }
-    band_powers = {}
-    for band, (low, high) in bands.items():
-        power = 0.0
-        for f, mag in zip(freq_bins, magnitudes):
-            if low <= f < high:
-                power += mag**2
-        band_powers[band] = power
-    return band_powers
+    freqs = np.asarray(freq_bins, dtype=float)
+    power = np.asarray(magnitudes, dtype=float) ** 2
+    return band_powers_dict(live_engine().band_powers_from_power(freqs, power))
 
+def band_masks(window_size, sample_rate=256):
+    """
+    Return a (bands x bins) 0/1 matrix selecting the rfft bins of each band
+    for a given window length and sample rate. Cached per (window, rate).
+    """
+    return live_engine(sample_rate).fft_masks(window_size)
+
+def band_powers_from_magnitudes(magnitudes, window_size, sample_rate=256):
+    """
+    Band powers for rfft magnitudes of shape (..., bins).
+    Returns an array of shape (..., bands) in EEG_BANDS order.
+    """
+    return live_engine(sample_rate).band_powers_from_magnitudes(magnitudes, window_size)
+
+def batch_band_powers(windows, sample_rate=256):
+    """
+    Band powers for a batch of windows (e.g. channels x samples) in one call.
+    The FFT runs along the last axis; returns an array of shape (..., bands).
+    """
+    return live_engine(sample_rate).band_powers(windows)
 
+def band_powers_dict(powers):
+    """Turn a 1-D band power array into the {band: power} dict sent to clients."""
+    return dict(zip(EEG_BANDS, np.asarray(powers, dtype=float).tolist()))
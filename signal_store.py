@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Columnar signal store: one float32 .npy of shape (channels, samples) per
+# recording plus index.json describing patient, class, eye state and channel
+# names. Recordings are opened with np.load(mmap_mode='r'), so reading one
+# channel is a zero-copy row slice of the mapped file.
+
+INDEX = 'index.json'
+CLASSES = [('Healthy', 0), ('AD', 1)]
+EYE_STATES = ['Eyes_open', 'Eyes_closed']
+
+
+def read_text_signal(path):
+    values = pd.read_csv(path, header=None, sep=r'\s+', dtype=np.float64).to_numpy()
+    return values.ravel() if values.shape[1] == 1 else values
+
+
+def source_signature(patient_dir, files):
+    stats = [os.stat(os.path.join(patient_dir, f)) for f in files]
+    return {
+        'mtime_ns': max(s.st_mtime_ns for s in stats),
+        'size': sum(s.st_size for s in stats),
+        'files': len(files),
+    }
+
+
+def load_index(store_dir):
+    path = os.path.join(store_dir, INDEX)
+    if not os.path.exists(path):
+        return {'version': 1, 'dtype': 'float32', 'recordings': []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_index(store_dir, index):
+    tmp = os.path.join(store_dir, f'{INDEX}.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp, os.path.join(store_dir, INDEX))
+
+
+def import_tree(base_dir, store_dir, force=False):
+    os.makedirs(store_dir, exist_ok=True)
+    old = {r['patient_id']: r for r in load_index(store_dir)['recordings']}
+    recordings = []
+    converted = skipped = 0
+    for class_label, label_id in CLASSES:
+        for eye_state in EYE_STATES:
+            path = os.path.join(base_dir, class_label, eye_state)
+            if not os.path.isdir(path):
+                continue
+            for patient_folder in sorted(os.listdir(path)):
+                patient_dir = os.path.join(path, patient_folder)
+                if not os.path.isdir(patient_dir):
+                    continue
+                files = [f for f in os.listdir(patient_dir) if f.endswith('.txt')]
+                if not files:
+                    continue
+                patient_id = f'{class_label}_{eye_state}_{patient_folder}'
+                signature = source_signature(patient_dir, files)
+                previous = old.get(patient_id)
+                if (not force and previous and previous['source'] == signature
+                        and os.path.exists(os.path.join(store_dir, previous['file']))):
+                    recordings.append(previous)
+                    skipped += 1
+                    continue
+
+                signals = [np.asarray(read_text_signal(os.path.join(patient_dir, f)), dtype=np.float32) for f in files]
+                lengths = [len(s) for s in signals]
+                # channels of unequal length are zero padded; `lengths` keeps the real sizes
+                data = np.zeros((len(signals), max(lengths)), dtype=np.float32)
+                for row, signal in zip(data, signals):
+                    row[:len(signal)] = signal
+                file_name = f'{patient_id}.npy'
+                np.save(os.path.join(store_dir, file_name), data)
+
+                recordings.append({
+                    'patient_id': patient_id,
+                    'label': label_id,
+                    'class': class_label,
+                    'eye_state': eye_state,
+                    'channels': [os.path.splitext(f)[0] for f in files],
+                    'lengths': lengths,
+                    'file': file_name,
+                    'source': signature,
+                })
+                converted += 1
+
+    # drop arrays of recordings that disappeared from the source tree
+    kept = {r['file'] for r in recordings}
+    for r in old.values():
+        if r['file'] not in kept and os.path.exists(os.path.join(store_dir, r['file'])):
+            os.remove(os.path.join(store_dir, r['file']))
+
+    save_index(store_dir, {'version': 1, 'dtype': 'float32', 'recordings': recordings})
+    return converted, skipped
+
+
+def open_recording(store_dir, recording):
+    return np.load(os.path.join(store_dir, recording['file']), mmap_mode='r')
+
+
+def channel_views(store_dir, recording):
+    # zero-copy (name, signal) pairs; each signal is a view into the memory map
+    data = open_recording(store_dir, recording)
+    for ch, (name, length) in enumerate(zip(recording['channels'], recording['lengths'])):
+        yield name, data[ch, :length]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Columnar EEG signal store.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    imp = sub.add_parser('import', help='convert an EEG_data/<class>/<eye_state>/<patient>/*.txt tree')
+    imp.add_argument('base_dir')
+    imp.add_argument('store_dir')
+    imp.add_argument('--force', action='store_true', help='reconvert unchanged recordings too')
+    info = sub.add_parser('info', help='summarize a store')
+    info.add_argument('store_dir')
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        start = time.perf_counter()
+        converted, skipped = import_tree(args.base_dir, args.store_dir, args.force)
+        print(f'Converted {converted} recordings, {skipped} unchanged, in {time.perf_counter() - start:.2f} s')
+    else:
+        recordings = load_index(args.store_dir)['recordings']
+        size = sum(os.path.getsize(os.path.join(args.store_dir, r['file'])) for r in recordings)
+        print(f'{len(recordings)} recordings, {size / 1e6:.1f} MB')
+
+
+if __name__ == '__main__':
+    main()
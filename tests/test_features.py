@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+from scipy.signal import welch
+
+from features import EEG_BANDS, TRAINING_BANDS, live_engine, training_engine
+
+WINDOW_SIZES = (640, 1280, 2560)
+
+
+def reference_training_features(signal, fs=128):
+    """The original data_clean.extract_features_from_signal."""
+    features = [np.mean(signal), np.std(signal), np.max(signal), np.min(signal)]
+    freqs, psd = welch(signal, fs=fs)
+    total_power = np.sum(psd)
+    for low, high in TRAINING_BANDS.values():
+        band_power = np.sum(psd[(freqs >= low) & (freqs <= high)])
+        features.append(band_power / total_power if total_power > 0 else 0)
+    return features
+
+
+def reference_live_band_powers(signal, fs=256):
+    """The original utlis.calculate_fft + calculate_band_powers loop."""
+    freqs = np.fft.rfftfreq(len(signal), d=1 / fs)
+    magnitudes = np.abs(np.fft.rfft(signal))
+    return [sum(m ** 2 for f, m in zip(freqs, magnitudes) if low <= f < high) for low, high in EEG_BANDS.values()]
+
+
+@pytest.mark.parametrize("n", WINDOW_SIZES)
+def test_training_features_match_reference(n):
+    signals = np.random.default_rng(n).normal(size=(4, n)) * 20
+    expected = np.array([reference_training_features(s) for s in signals])
+    np.testing.assert_allclose(training_engine(128).features(signals), expected, rtol=1e-7, atol=1e-9)
+
+
+@pytest.mark.parametrize("n", WINDOW_SIZES)
+def test_live_band_powers_match_reference(n):
+    signals = np.random.default_rng(n).normal(size=(4, n)) * 20
+    expected = np.array([reference_live_band_powers(s) for s in signals])
+    np.testing.assert_allclose(live_engine(256).band_powers(signals), expected, rtol=1e-7)
+
+
+def test_bucketed_features_keep_input_order():
+    rng = np.random.default_rng(0)
+    mixed = [rng.normal(size=n) for n in (300, 640, 300, 1280)]
+    expected = np.array([reference_training_features(s) for s in mixed])
+    np.testing.assert_allclose(training_engine(128).features_bucketed(mixed), expected, rtol=1e-7, atol=1e-9)
@@ -0,0 +1,57 @@
+import numpy as np
+
+from history import DeviceHistory, HistoryStore
+
+TIERS = ((1, 100), (10, 100), (60, 10))
+
+
+def test_rollups_aggregate_samples_per_slot():
+    history = DeviceHistory("dev", channels=1, tiers=TIERS)
+    for second in range(25):
+        for k in range(4):
+            history.add(np.array([[second * 10.0 + k]]), 1000 + second + k / 4)
+    fine = history.tier(1).query(1000, 1025)
+    # the slot of the newest block stays open until a later block arrives
+    assert fine["time"].tolist() == list(range(1000, 1024))
+    assert fine["count"].tolist() == [4] * 24
+    np.testing.assert_allclose(fine["min"][:, 0], np.arange(24) * 10)
+    np.testing.assert_allclose(fine["max"][:, 0], np.arange(24) * 10 + 3)
+    np.testing.assert_allclose(fine["mean"][:, 0], np.arange(24) * 10 + 1.5)
+
+    coarse = history.tier(10).query(0, 2000)
+    assert coarse["time"].tolist() == [1000, 1010]
+    assert coarse["count"].tolist() == [40, 40]
+    np.testing.assert_allclose(coarse["min"][:, 0], [0, 100])
+    np.testing.assert_allclose(coarse["max"][:, 0], [93, 193])
+
+
+def test_query_includes_open_buckets():
+    history = DeviceHistory("dev", channels=1, tiers=TIERS)
+    for second in range(75):
+        history.add(np.array([[float(second)]]), 1000 + second)
+    # closed so far: 1 s slots up to 1073, 10 s slots up to 1060, the 60 s slot at 960
+    assert history.tier(60).query(0, 2000)["time"].tolist() == [960]
+    coarse = history.query(history.tier(60), 0, 2000)
+    assert coarse["time"].tolist() == [960, 1020]
+    assert coarse["count"].tolist() == [20, 55]
+    np.testing.assert_allclose(coarse["max"][:, 0], [19, 74])
+    fine = history.query(history.tier(1), 1070, 2000)
+    assert fine["time"].tolist() == [1070, 1071, 1072, 1073, 1074]
+    np.testing.assert_allclose(fine["mean"][:, 0], [70, 71, 72, 73, 74])
+
+
+def test_tier_ring_keeps_newest_buckets():
+    history = DeviceHistory("dev", channels=2, tiers=((1, 5), (10, 5)))
+    for second in range(12):
+        history.add(np.full((2, 1), second), 1000 + second)
+    rows = history.tier(1).query(0, 2000)
+    assert rows["time"].tolist() == [1006, 1007, 1008, 1009, 1010]
+    assert rows["mean"].shape == (5, 2)
+    assert history.tier(1).query(1007, 1009)["time"].tolist() == [1007, 1008]
+
+
+def test_channel_change_starts_a_new_history():
+    store = HistoryStore(TIERS)
+    store.add("dev", np.zeros((1, 4)), timestamp=1000)
+    store.add("dev", np.zeros((2, 4)), timestamp=1001)
+    assert store.get("dev").channels == 2
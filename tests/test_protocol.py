@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+import frames
+from broker import pack_message, unpack_message
+from protocol import HEADER, MIN_SAMPLE_RATE, FrameError, decode_frame, encode_frame
+from sessions import DeviceSession
+
+
+@pytest.mark.parametrize("dtype", ["<f4", "<i2", "<u2"])
+def test_sample_frame_round_trip(dtype):
+    samples = np.arange(3 * 10).reshape(3, 10).astype(dtype)
+    header, decoded = decode_frame(encode_frame(samples, "dev-1", sequence=7, sample_rate=250, dtype=dtype))
+    assert header == {"device_id": "dev-1", "sequence": 7, "sample_rate": 250, "channels": 3, "n_samples": 10}
+    assert decoded.dtype == np.dtype(dtype)
+    np.testing.assert_array_equal(decoded, samples)
+
+
+@pytest.mark.parametrize("payload", [
+    b"EG",
+    b"XX" + encode_frame(np.zeros((1, 4)))[2:],
+    encode_frame(np.zeros((1, 4)))[:-1],
+    encode_frame(np.zeros((1, 4)), sample_rate=MIN_SAMPLE_RATE - 1),
+    encode_frame(np.zeros((1, 4)), sample_rate=0),
+])
+def test_malformed_sample_frames_are_rejected(payload):
+    with pytest.raises(FrameError):
+        decode_frame(payload)
+
+
+def test_broker_message_round_trip():
+    samples = np.random.default_rng(0).normal(size=(2, 16)).astype(np.float32)
+    message = pack_message("device-ü", samples, 512)
+    device_id, decoded, sample_rate = unpack_message(message[4:])
+    assert (device_id, sample_rate) == ("device-ü", 512)
+    np.testing.assert_array_equal(decoded, samples)
+
+
+def test_binary_dashboard_frame_layout():
+    session = DeviceSession("dev", channels=2, window_size=256, sample_rate=256, hop=32)
+    signal = np.random.default_rng(0).normal(size=(2, 300))
+    session.push(signal)
+    payload = frames.encode_frame(session, "binary", delta=(290, signal[:, -10:]))
+    magic, version, kind, channels, n_bands, n_bins, n_samples, start = frames.HEADER.unpack_from(payload)
+    assert (magic, version, kind, channels) == (frames.MAGIC, frames.VERSION, frames.DELTA, 2)
+    assert (n_bins, n_samples, start) == (129, 10, 290)
+    body = np.frombuffer(payload, dtype="<f4", offset=frames.HEADER.size)
+    np.testing.assert_allclose(body[:2 * n_samples].reshape(2, n_samples), signal[:, -10:], rtol=1e-6)
+    magnitudes = body[2 * n_samples:2 * (n_samples + n_bins)].reshape(2, n_bins)
+    np.testing.assert_allclose(magnitudes, session.spectrum.magnitudes(), rtol=1e-5)
+    assert len(payload) == frames.HEADER.size + 4 * 2 * (n_samples + n_bins + n_bands)
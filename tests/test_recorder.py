@@ -0,0 +1,58 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from recorder import DeviceRecorder, Recorder
+
+
+def write_blocks(device, signal, block, t0=1000.0, sample_rate=256):
+    for i in range(0, signal.shape[1], block):
+        device.write([(signal[:, i:i + block], sample_rate, t0 + (i + block) / sample_rate)])
+
+
+def test_reads_span_segments(tmp_path):
+    device = DeviceRecorder(str(tmp_path), "dev", segment_samples=100)
+    signal = np.random.default_rng(0).normal(size=(2, 450)).astype(np.float32)
+    write_blocks(device, signal, 64)
+    assert device.total == 450
+    assert [s["start"] for s in device.segments] == [0, 100, 200, 300, 400]
+    np.testing.assert_array_equal(device.read(0, 450), signal)
+    np.testing.assert_array_equal(device.read(95, 305), signal[:, 95:305])
+
+
+def test_other_process_sees_every_segment(tmp_path):
+    writer = DeviceRecorder(str(tmp_path), "dev", segment_samples=100)
+    signal = np.random.default_rng(1).normal(size=(1, 256)).astype(np.float32)
+    write_blocks(writer, signal[:, :128], 64)
+    reader = DeviceRecorder(str(tmp_path), "dev", segment_samples=100)
+    assert reader.total == 128
+    write_blocks(writer, signal[:, 128:], 64, t0=1000.5)
+    reader.refresh()
+    assert reader.total == 256
+    np.testing.assert_array_equal(reader.read(0, 256), signal)
+    assert reader.offset_at(1000.5) == writer.offset_at(1000.5)
+
+
+def test_timestamps_map_to_offsets(tmp_path):
+    device = DeviceRecorder(str(tmp_path), "dev")
+    write_blocks(device, np.zeros((1, 256 * 10), dtype=np.float32), 32)
+    assert device.offset_at(1001.0) == 256
+    assert device.offset_at(1005.0) == 256 * 5
+    assert device.offset_at(0) == 0
+    assert device.offset_at(2000) == device.total
+    assert device.time_at(512) == pytest.approx(1002.0)
+
+
+def test_recorder_flushes_queued_blocks(tmp_path):
+    async def record():
+        recorder = Recorder(str(tmp_path), flush_interval=60)
+        recorder.append("dev/1", np.ones((2, 32)), 256)
+        recorder.append("dev/1", np.zeros((2, 32)), 256)
+        await recorder.stop()
+        return recorder
+
+    asyncio.run(record())
+    device = Recorder(str(tmp_path)).get("dev/1")
+    assert device.total == 64
+    np.testing.assert_array_equal(device.read(30, 34), [[1, 1, 0, 0]] * 2)
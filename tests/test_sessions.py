@@ -0,0 +1,52 @@
+import numpy as np
+
+from sessions import DeviceSession
+
+
+def make_session():
+    return DeviceSession("dev", channels=1, window_size=64, sample_rate=256, hop=8)
+
+
+def test_take_delta_returns_samples_since_last_call():
+    session = make_session()
+    signal = np.arange(100, dtype=float).reshape(1, 100)
+    session.push(signal[:, :40])
+    start, samples = session.take_delta()
+    assert start == 0
+    np.testing.assert_array_equal(samples, signal[:, :40])
+    session.push(signal[:, 40:50])
+    start, samples = session.take_delta()
+    assert start == 40
+    np.testing.assert_array_equal(samples, signal[:, 40:50])
+    assert session.take_delta()[1].shape == (1, 0)
+
+
+def test_take_delta_is_capped_to_the_window():
+    session = make_session()
+    signal = np.arange(200, dtype=float).reshape(1, 200)
+    session.push(signal)
+    start, samples = session.take_delta()
+    assert start == 136
+    np.testing.assert_array_equal(samples, signal[:, -64:])
+
+
+def test_restore_delta_hands_samples_back():
+    session = make_session()
+    signal = np.arange(60, dtype=float).reshape(1, 60)
+    session.push(signal[:, :20])
+    session.take_delta()
+    session.push(signal[:, 20:30])
+    start, _ = session.take_delta()
+    session.restore_delta(start)
+    session.push(signal[:, 30:60])
+    start, samples = session.take_delta()
+    assert start == 20
+    np.testing.assert_array_equal(samples, signal[:, 20:60])
+
+
+def test_raw_window_keeps_unfiltered_samples():
+    session = make_session()
+    signal = np.random.default_rng(0).normal(size=(1, 100)) + 5
+    session.push(session.condition(signal))
+    np.testing.assert_array_equal(session.raw_window(), signal[:, -64:])
+    assert not np.allclose(session.spectrum.window(), signal[:, -64:])
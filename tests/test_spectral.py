@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from scipy.signal import welch
+
+from features import live_engine
+from spectral import RingBuffer, SlidingSpectrum
+from spectrogram import Spectrogram
+
+
+def test_ring_buffer_keeps_latest_samples_in_order():
+    buffer = RingBuffer(8, channels=2)
+    stream = np.arange(40, dtype=float).reshape(2, 20)
+    for i in range(0, 20, 3):
+        buffer.write(stream[:, i:i + 3])
+    assert buffer.total == 20
+    assert len(buffer) == 8
+    np.testing.assert_array_equal(buffer.latest(), stream[:, -8:])
+    np.testing.assert_array_equal(buffer.latest(3), stream[:, -3:])
+
+
+def test_ring_buffer_returns_overwritten_samples():
+    buffer = RingBuffer(4)
+    np.testing.assert_array_equal(buffer.write(np.array([[1.0, 2.0, 3.0]])), [[0, 0, 0]])
+    np.testing.assert_array_equal(buffer.write(np.array([[4.0, 5.0]])), [[0, 1]])
+    # a block at least as long as the buffer replaces it outright
+    assert buffer.write(np.arange(6.0).reshape(1, 6)) is None
+    np.testing.assert_array_equal(buffer.latest(), [[2, 3, 4, 5]])
+
+
+@pytest.mark.parametrize("block", [1, 7, 32, 300, 2000])
+def test_sliding_spectrum_matches_full_fft(block):
+    signal = np.random.default_rng(block).normal(size=(2, 5000))
+    spectrum = SlidingSpectrum(1280, 256, hop=32, channels=2)
+    for i in range(0, signal.shape[1], block):
+        spectrum.push(signal[:, i:i + block])
+    np.testing.assert_array_equal(spectrum.window(), signal[:, -1280:])
+    np.testing.assert_allclose(spectrum.magnitudes(), np.abs(np.fft.rfft(signal[:, -1280:], axis=-1)), atol=1e-8)
+
+
+def test_sliding_spectrum_band_powers_match_engine():
+    signal = np.random.default_rng(0).normal(size=(3, 5000))
+    spectrum = SlidingSpectrum(1280, 256, hop=32, channels=3)
+    for i in range(0, 5000, 7):
+        spectrum.push(signal[:, i:i + 7])
+    engine = live_engine(256)
+    incremental = engine.band_powers_from_magnitudes(spectrum.magnitudes(), 1280)
+    np.testing.assert_allclose(incremental, engine.band_powers(spectrum.window()), rtol=1e-8)
+
+
+def test_sliding_spectrum_reports_frames_every_hop():
+    spectrum = SlidingSpectrum(64, 256, hop=16)
+    due = [spectrum.push(np.ones(4)) for _ in range(8)]
+    assert due == [False, False, False, True] * 2
+
+
+def test_spectrogram_psd_matches_welch():
+    signal = np.random.default_rng(1).normal(size=(2, 4096))
+    spectrogram = Spectrogram(256, channels=2, segment=256, hop=32, averages=33)
+    for i in range(0, signal.shape[1], 50):
+        spectrogram.push(signal[:, i:i + 50])
+    _, expected = welch(signal[:, -1280:], fs=256, nperseg=256, noverlap=256 - 32, detrend=False)
+    np.testing.assert_allclose(spectrogram.psd(), expected, rtol=1e-8)